@@ -0,0 +1,125 @@
+import json
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+
+def approximate_nbytes(obj, depth=3):
+    """Bytes held by an object's arrays and DataFrames, following attributes a few levels deep"""
+    seen = set()
+
+    def size(value, depth):
+        if id(value) in seen:
+            return 0
+        seen.add(id(value))
+        # Memory-mapped arrays count too: their temporary files are freed with the model
+        if isinstance(value, np.ndarray):
+            return value.nbytes
+        if isinstance(value, (pd.DataFrame, pd.Series)):
+            return int(np.sum(value.memory_usage(index=True)))
+        if depth <= 0:
+            return 0
+        if isinstance(value, dict):
+            return sum(size(item, depth - 1) for item in value.values())
+        if isinstance(value, (list, tuple)):
+            return sum(size(item, depth - 1) for item in value)
+        if hasattr(value, '__dict__'):
+            return sum(size(item, depth - 1) for item in vars(value).values())
+        return 0
+
+    return size(obj, depth)
+
+
+class DatasetCache:
+    """Content-addressed cache of parsed uploads and compiled models, shared across sessions.
+
+    Cached DataFrames and models are shared by every session that uploads the same
+    bytes, so callers must treat them as read-only.
+    """
+
+    def __init__(self, max_datasets=16, max_model_bytes=1 << 30, chunk_size=1 << 20):
+        self.max_datasets = max_datasets
+        self.max_model_bytes = max_model_bytes
+        self.chunk_size = chunk_size
+        self._datasets = OrderedDict()
+        self._models = OrderedDict()
+        self._model_bytes = {}
+        self._lock = threading.Lock()
+
+    def read_upload(self, file):
+        """Hash an uploaded file while streaming it; returns (digest, DataFrame, cache_hit)"""
+        digest = hashlib.sha256()
+        with tempfile.SpooledTemporaryFile(max_size=64 * self.chunk_size) as spool:
+            while True:
+                chunk = file.read(self.chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                spool.write(chunk)
+            digest = digest.hexdigest()
+
+            df = self.get_dataset(digest)
+            if df is not None:
+                print(f"Reusing cached dataset {digest[:12]}")
+                return digest, df, True
+
+            spool.seek(0)
+            df = pd.read_csv(spool)
+
+        self._put(self._datasets, digest, df, self.max_datasets)
+        return digest, df, False
+
+    def get_dataset(self, digest):
+        return self._get(self._datasets, digest)
+
+    @staticmethod
+    def model_key(digest, system_type, columns, algorithm=None, params=None):
+        """Cache key for a model compiled from a dataset, or None for un-hashed datasets"""
+        if not digest:
+            return None
+        return json.dumps({
+            'data': digest,
+            'system_type': system_type,
+            'columns': list(columns),
+            'algorithm': algorithm,
+            'params': params or {}
+        }, sort_keys=True)
+
+    def get_model(self, key):
+        if key is None:
+            return None
+        return self._get(self._models, key)
+
+    def put_model(self, key, model):
+        """Cache a model, evicting least recently used ones to stay within the byte budget"""
+        if key is None:
+            return
+        size = approximate_nbytes(model)
+        if size > self.max_model_bytes:
+            print(f"Not caching a {size >> 20} MB model, larger than the {self.max_model_bytes >> 20} MB cache")
+            return
+        with self._lock:
+            self._models[key] = model
+            self._models.move_to_end(key)
+            self._model_bytes[key] = size
+            while sum(self._model_bytes.values()) > self.max_model_bytes:
+                evicted, _ = self._models.popitem(last=False)
+                self._model_bytes.pop(evicted)
+
+    def _get(self, store, key):
+        with self._lock:
+            value = store.get(key)
+            if value is not None:
+                store.move_to_end(key)
+            return value
+
+    def _put(self, store, key, value, max_entries):
+        # Least recently used entries are evicted first
+        with self._lock:
+            store[key] = value
+            store.move_to_end(key)
+            while len(store) > max_entries:
+                store.popitem(last=False)
@@ -0,0 +1,178 @@
+import os
+import json
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from recommender import RecommenderSystem
+
+SPLIT_METHODS = ('random', 'time')
+
+
+def split_interactions(data, method='random', n_folds=5, timestamp_col='timestamp', seed=42, user_col=None):
+    """Return a list of (train_rows, test_rows) positional index arrays"""
+    if method not in SPLIT_METHODS:
+        raise ValueError(f"Unknown split method '{method}'. Use one of {list(SPLIT_METHODS)}")
+    if n_folds < 2:
+        raise ValueError("At least 2 folds are required for evaluation")
+
+    n_rows = len(data)
+
+    if method == 'random':
+        # Plain K-fold over shuffled interactions
+        order = np.random.default_rng(seed).permutation(n_rows)
+        chunks = np.array_split(order, n_folds)
+        return [
+            (np.concatenate(chunks[:fold] + chunks[fold + 1:]), chunks[fold])
+            for fold in range(n_folds)
+        ]
+
+    if timestamp_col not in data.columns:
+        raise ValueError(f"Time-based split requires a '{timestamp_col}' column")
+    if user_col is None:
+        raise ValueError("Time-based split requires the user column")
+
+    # Per-user expanding window: each user's interactions, in time order, are cut into n_folds + 1
+    # chunks; fold f trains on every user's first f + 1 chunks and tests on their next chunk. Every
+    # test user has earlier interactions in training, unlike one global cut-off
+    users = pd.factorize(data[user_col])[0]
+    order = np.lexsort((data[timestamp_col].to_numpy(), users))
+    counts = np.bincount(users)[users[order]]
+    first = np.r_[True, users[order][1:] != users[order][:-1]]
+    position = np.arange(n_rows) - np.maximum.accumulate(np.where(first, np.arange(n_rows), 0))
+    chunk = np.empty(n_rows, dtype=np.int64)
+    chunk[order] = position * (n_folds + 1) // counts
+    return [
+        (np.flatnonzero(chunk <= fold), np.flatnonzero(chunk == fold + 1))
+        for fold in range(n_folds)
+    ]
+
+
+def ranking_metrics(scores, relevant, k=10):
+    """Precision@K, recall@K and NDCG@K for all users at once.
+
+    scores is a (users x items) matrix with already-seen items set to -inf,
+    relevant a boolean matrix of the same shape marking held-out relevant items.
+    """
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top = np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+    hits = np.take_along_axis(relevant, top, axis=1)
+
+    n_relevant = relevant.sum(axis=1)
+    has_relevant = n_relevant > 0
+    if not has_relevant.any():
+        return {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'users': 0}
+
+    discounts = 1.0 / np.log2(np.arange(2, k + 2))
+    dcg = (hits * discounts).sum(axis=1)
+    ideal_hits = np.arange(k)[None, :] < n_relevant[:, None]
+    idcg = (ideal_hits * discounts).sum(axis=1)
+
+    hits, n_relevant = hits[has_relevant], n_relevant[has_relevant]
+    return {
+        'precision': float((hits.sum(axis=1) / k).mean()),
+        'recall': float((hits.sum(axis=1) / n_relevant).mean()),
+        'ndcg': float((dcg[has_relevant] / idcg[has_relevant]).mean()),
+        'users': int(has_relevant.sum())
+    }
+
+
+def _evaluate_fold(task):
+    """Train one model on a fold and score its held-out interactions (runs in a worker process)"""
+    train, test, columns, algorithm, k, threshold = task
+    user_col, item_col, rating_col = columns
+
+    # Evaluate the trained model itself, not a compact serving copy of it
+    recommender = RecommenderSystem(train, 'collaborative', columns, algorithm=algorithm, params={'precision': 'float64'})
+
+    test_users = test[user_col].astype(str).to_numpy()
+    test_items = test[item_col].astype(str).to_numpy()
+    test_ratings = pd.to_numeric(test[rating_col]).to_numpy(dtype=np.float64)
+
+    user_idx = np.array([recommender.user_to_idx.get(user, -1) for user in test_users])
+    item_idx = np.array([recommender.item_to_idx.get(item, -1) for item in test_items])
+    known_user = user_idx >= 0
+    known = known_user & (item_idx >= 0)
+
+    # Score every item for every test user seen in training in one batch
+    eval_users = np.unique(user_idx[known_user])
+    scores = recommender.predict_scores([recommender.idx_to_user[idx] for idx in eval_users])
+    row_of_user = np.full(len(recommender.user_to_idx), -1)
+    row_of_user[eval_users] = np.arange(len(eval_users))
+
+    # Ratings for pairs the model has never seen fall back to the global mean
+    predictions = np.full(len(test), recommender.global_mean)
+    predictions[known] = scores[row_of_user[user_idx[known]], item_idx[known]]
+    rmse = float(np.sqrt(np.mean((predictions - test_ratings) ** 2)))
+
+    relevant = np.zeros(scores.shape, dtype=bool)
+    liked = known & (test_ratings >= threshold)
+    relevant[row_of_user[user_idx[liked]], item_idx[liked]] = True
+
+    train_rows = recommender.processed_data
+    seen = row_of_user[train_rows['user_idx'].to_numpy()]
+    in_eval = seen >= 0
+    scores[seen[in_eval], train_rows['item_idx'].to_numpy()[in_eval]] = -np.inf
+
+    metrics = ranking_metrics(scores, relevant, k)
+    metrics['rmse'] = rmse
+    metrics['test_size'] = int(len(test))
+    metrics['coverage'] = float(known.mean()) if len(test) else 0.0
+    return metrics
+
+
+def evaluate_models(data, columns, algorithms=('svd',), split='random', n_folds=5,
+                    k=10, threshold=4.0, timestamp_col='timestamp', seed=42, max_workers=None):
+    """Cross-validate collaborative models, training folds in parallel across processes"""
+    try:
+        print(f"Evaluating {list(algorithms)} with {n_folds}-fold {split} split")
+        folds = split_interactions(data, split, n_folds, timestamp_col, seed, user_col=columns[0])
+
+        tasks = []
+        for algorithm in algorithms:
+            for train_rows, test_rows in folds:
+                tasks.append((
+                    data.iloc[train_rows].reset_index(drop=True),
+                    data.iloc[test_rows].reset_index(drop=True),
+                    columns, algorithm, k, threshold
+                ))
+
+        workers = max_workers or min(len(tasks), os.cpu_count() or 1)
+        # forkserver: the web server is multithreaded, so never fork it directly
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('forkserver')) as executor:
+            fold_results = list(executor.map(_evaluate_fold, tasks))
+
+        results = {}
+        for position, algorithm in enumerate(algorithms):
+            folds_metrics = fold_results[position * n_folds:(position + 1) * n_folds]
+            results[algorithm] = {
+                'mean': {
+                    name: float(np.mean([fold[name] for fold in folds_metrics]))
+                    for name in ('rmse', 'precision', 'recall', 'ndcg')
+                },
+                'folds': folds_metrics
+            }
+            print(f"{algorithm}: {results[algorithm]['mean']}")
+
+        return results
+
+    except Exception as e:
+        print(f"Error in evaluate_models: {str(e)}")
+        raise
+
+
+def evaluation_cache_key(columns, algorithm, split, n_folds, k, threshold, seed,
+                         timestamp_col='timestamp', data_version=None):
+    """Stable cache key for one evaluated model configuration on one version of the data"""
+    return json.dumps({
+        'data_version': data_version,
+        'columns': list(columns),
+        'timestamp_col': timestamp_col if split == 'time' else None,
+        'algorithm': algorithm,
+        'split': split,
+        'n_folds': n_folds,
+        'k': k,
+        'threshold': threshold,
+        'seed': seed
+    }, sort_keys=True)
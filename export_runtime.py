@@ -0,0 +1,309 @@
+"""Standalone runtime for models exported from /export-model.
+
+Needs only numpy, scipy and scikit-learn (for tokenizing content queries).
+Arrays are memory-mapped from the bundle, so loading takes milliseconds and
+several processes serving the same bundle share one copy of the data.
+
+    from runtime import load_model
+    model = load_model('recommender_model.zip')   # or a directory the bundle was extracted to
+    model.generate_recommendations({'userId': '42'}, n_recommendations=10)
+"""
+import os
+import re
+import json
+import shutil
+import hashlib
+import zipfile
+import tempfile
+import unicodedata
+import numpy as np
+from sklearn.feature_extraction.text import CountVectorizer, HashingVectorizer
+
+FORMAT_VERSION = 1
+
+# Same candidate pool sizes as the app, so exact re-scoring picks the same candidates
+CANDIDATES_PER_RESULT = 10
+MAX_CANDIDATES = 500
+RESCORE_CANDIDATES = 200
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+
+
+def normalize_title(title):
+    """Same normalization as the app's title index, so title keys match"""
+    text = unicodedata.normalize('NFKD', str(title))
+    text = text.encode('ascii', 'ignore').decode().lower()
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def _fingerprint(bundle):
+    """Content hash of a zip from its directory (entry names, sizes and CRCs), without reading the data"""
+    digest = hashlib.sha256()
+    for info in bundle.infolist():
+        digest.update(f"{info.filename}:{info.file_size}:{info.CRC}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def _extract(path):
+    """Unpack a bundle zip next to itself, once per distinct content; arrays must be plain files to be mmapped"""
+    with zipfile.ZipFile(path) as bundle:
+        # A re-exported bundle at the same path gets its own directory instead of reusing a stale one
+        target = f"{os.path.splitext(path)[0]}-{_fingerprint(bundle)}"
+        if not os.path.exists(os.path.join(target, 'manifest.json')):
+            staging = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(path)))
+            bundle.extractall(staging)
+            try:
+                os.rename(staging, target)
+            except OSError:
+                # Another process extracted the same bundle first
+                shutil.rmtree(staging, ignore_errors=True)
+    return target
+
+
+def load_model(path):
+    """Load an exported bundle (directory or .zip) without retraining anything"""
+    if zipfile.is_zipfile(path):
+        path = _extract(path)
+
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    if manifest['format_version'] > FORMAT_VERSION:
+        raise ValueError(f"Bundle format {manifest['format_version']} is newer than this runtime")
+
+    with open(os.path.join(path, 'ids.json')) as f:
+        ids = json.load(f)
+    arrays = {
+        name: np.load(os.path.join(path, 'arrays', f'{name}.npy'), mmap_mode='r')
+        for name in manifest['arrays']
+    }
+
+    if manifest['system_type'] == 'collaborative':
+        return CollaborativeModel(manifest, ids, arrays)
+    return ContentModel(manifest, ids, arrays)
+
+
+def _rescore_pool_size(n, n_available):
+    """How many of the best approximate candidates to re-score exactly"""
+    pool = min(n_available, max(n, min(CANDIDATES_PER_RESULT * n, MAX_CANDIDATES)))
+    return min(n_available, max(RESCORE_CANDIDATES, 2 * pool))
+
+
+def _top_k(scores, k):
+    """Indices of the k highest scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind='stable')]
+
+
+class ContentModel:
+    """TF-IDF content model served from an inverted (column-major) index"""
+
+    def __init__(self, manifest, ids, arrays):
+        self.manifest = manifest
+        self.labels = ids['labels']
+        self.label_codes = arrays['label_codes']
+        self.dedupe_codes = arrays['dedupe_codes']
+        self.idf = arrays['idf']
+        self.term_indptr = arrays['term_indptr']
+        self.term_rows = arrays['term_rows']
+        self.term_weights = arrays['term_weights']
+
+        vectorizer = manifest['vectorizer']
+        options = dict(vectorizer['options'], ngram_range=tuple(vectorizer['options']['ngram_range']))
+        if vectorizer['kind'] == 'hashing':
+            self.vectorizer = HashingVectorizer(
+                n_features=vectorizer['n_features'], alternate_sign=False, norm=None, **options
+            )
+        else:
+            self.vectorizer = CountVectorizer(vocabulary=ids['vocabulary'], **options)
+
+    def _query_vector(self, text):
+        """TF-IDF weights of the query's terms, L2-normalized like the training rows"""
+        counts = self.vectorizer.transform([text])
+        counts.sum_duplicates()
+        weights = counts.data * self.idf[counts.indices]
+        norm = np.sqrt((weights ** 2).sum())
+        return counts.indices, weights / norm if norm else weights
+
+    def score(self, text):
+        """Cosine similarity of the query with every catalog row"""
+        scores = np.zeros(len(self.label_codes), dtype=np.float32)
+        terms, weights = self._query_vector(text)
+        # Only the posting lists of the query's terms are touched
+        for term, weight in zip(terms, weights):
+            start, stop = self.term_indptr[term], self.term_indptr[term + 1]
+            scores[self.term_rows[start:stop]] += weight * self.term_weights[start:stop]
+        return scores
+
+    def generate_recommendations(self, inputs, n_recommendations=5, min_score=0.1):
+        """Most similar catalog rows, one per distinct output value"""
+        values = inputs.values() if isinstance(inputs, dict) else [inputs]
+        scores = self.score(' '.join(str(v).lower() for v in values))
+
+        candidates = np.flatnonzero(scores >= min_score)
+        candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+        # First (best) row of each output value, still in score order
+        _, first = np.unique(self.dedupe_codes[candidates], return_index=True)
+        picked = candidates[np.sort(first)][:n_recommendations]
+
+        return [
+            {'output_value': self.labels[self.label_codes[row]], 'score': float(scores[row])}
+            for row in picked
+        ]
+
+
+class CollaborativeModel:
+    """SVD or item-KNN collaborative model with the same scoring as the training app"""
+
+    def __init__(self, manifest, ids, arrays):
+        self.manifest = manifest
+        self.algorithm = manifest['algorithm']
+        self.user_col = manifest['user_col']
+        self.global_mean = manifest['global_mean']
+        self.rating_scale = tuple(manifest['rating_scale'])
+        self.arrays = arrays
+
+        self.item_names = ids['item_names']
+        self.user_to_idx = {user: idx for idx, user in enumerate(ids['user_ids'])}
+        self.item_to_idx = {item: idx for idx, item in enumerate(ids['item_ids'])}
+        # Normalized names that resolve to exactly one item, computed by the app at export time
+        self.title_keys = ids.get('title_keys', {})
+
+        self.user_indptr = arrays['user_indptr']
+        self.user_items = arrays['user_items']
+        self.user_ratings = arrays['user_ratings']
+
+    def _user_ratings(self, user_idx):
+        start, stop = self.user_indptr[user_idx], self.user_indptr[user_idx + 1]
+        return np.asarray(self.user_items[start:stop], dtype=np.int64), np.asarray(self.user_ratings[start:stop])
+
+    def _parse_ratings(self, ratings):
+        """(item, rating) pairs keyed by item id or unambiguous item name, like the app"""
+        pairs = ratings.items() if isinstance(ratings, dict) else [
+            (entry.get('item'), entry.get('rating')) if isinstance(entry, dict) else (entry[0], entry[1])
+            for entry in ratings
+        ]
+        ratings_by_item = {}
+        for item, rating in pairs:
+            key = str(item).strip()
+            item_idx = self.item_to_idx.get(key, self.title_keys.get(normalize_title(key)))
+            if item_idx is not None:
+                ratings_by_item[item_idx] = float(rating)
+        if not ratings_by_item:
+            raise ValueError("None of the rated items are in this model")
+        return np.array(list(ratings_by_item), dtype=np.int64), np.array(list(ratings_by_item.values()))
+
+    def _fold_in_user(self, item_idx, values):
+        item_factors = self.arrays['item_factors']
+        X = np.hstack([np.asarray(item_factors[item_idx], dtype=np.float64), np.ones((len(item_idx), 1))])
+        y = values - self.global_mean - self.arrays['item_bias'][item_idx]
+        reg = self.manifest['reg_pu'] * len(item_idx)
+        solution = np.linalg.solve(X.T @ X + reg * np.eye(X.shape[1]), X.T @ y)
+        return solution[:-1], solution[-1]
+
+    def _score_svd(self, user_vector, user_bias):
+        item_factors = self.arrays['item_factors']
+        user_vector = np.asarray(user_vector, dtype=item_factors.dtype)
+        return self.global_mean + user_bias + self.arrays['item_bias'] + item_factors @ user_vector
+
+    def _sim_block(self, start, stop, item_idx):
+        if 'item_sim_codes' in self.arrays:
+            codes = self.arrays['item_sim_codes'][start:stop][:, item_idx]
+            return codes.astype(np.float32) * self.arrays['item_sim_scales'][start:stop, None]
+        return self.arrays['item_sim'][start:stop][:, item_idx]
+
+    def _knn_predict(self, sims, values):
+        k, min_k = self.manifest['k'], self.manifest['min_k']
+        ratings = np.broadcast_to(values, sims.shape)
+        if sims.shape[1] > k:
+            top = np.argsort(-sims, axis=1, kind='stable')[:, :k]
+            sims = np.take_along_axis(sims, top, axis=1)
+            ratings = np.take_along_axis(ratings, top, axis=1)
+
+        positive = sims > 0
+        sum_sim = np.where(positive, sims, 0).sum(axis=1)
+        sum_ratings = np.where(positive, sims * ratings, 0).sum(axis=1)
+        enough = positive.sum(axis=1) >= min_k
+
+        predictions = np.full(len(sims), self.global_mean, dtype=np.float64)
+        predictions[enough] = sum_ratings[enough] / sum_sim[enough]
+        return predictions
+
+    def _score_knn(self, item_idx, values, block_size=2048):
+        n_items = len(self.item_names)
+        scores = np.empty(n_items, dtype=np.float64)
+        for start in range(0, n_items, block_size):
+            scores[start:start + block_size] = self._knn_predict(self._sim_block(start, start + block_size, item_idx), values)
+        return scores
+
+    def _rescore_exact(self, scores, item_idx, values, n_recommendations):
+        """Clipped scores with the best int8 candidates re-scored from float32 rows"""
+        scores = np.clip(scores, *self.rating_scale)
+        if 'item_sim_rescore' not in self.arrays:
+            return scores
+
+        available = len(scores) - len(np.unique(item_idx))
+        pool = _rescore_pool_size(min(n_recommendations, available), available)
+        if pool <= 0:
+            return scores
+        ranked = scores.copy()
+        ranked[item_idx] = -np.inf
+        candidates = np.argpartition(-ranked, pool - 1)[:pool]
+
+        sims = np.asarray(self.arrays['item_sim_rescore'][np.ix_(candidates, item_idx)], dtype=np.float64)
+        exact = np.clip(self._knn_predict(sims, values), *self.rating_scale)
+        np.minimum(scores, np.nextafter(exact.min(), -np.inf), out=scores)
+        scores[candidates] = exact
+        return scores
+
+    def predict_scores(self, user_ids, block_size=512):
+        """Clipped predicted ratings of every item for a batch of known users"""
+        user_idx = np.array([self.user_to_idx[str(user_id)] for user_id in user_ids], dtype=np.int64)
+        scores = np.empty((len(user_idx), len(self.item_names)), dtype=np.float64)
+
+        if self.algorithm == 'svd':
+            user_factors, item_factors = self.arrays['user_factors'], self.arrays['item_factors']
+            for start in range(0, len(user_idx), block_size):
+                users = user_idx[start:start + block_size]
+                scores[start:start + block_size] = (
+                    self.global_mean
+                    + self.arrays['user_bias'][users, None]
+                    + self.arrays['item_bias'][None, :]
+                    + user_factors[users] @ item_factors.T
+                )
+        else:
+            for row, idx in enumerate(user_idx):
+                scores[row] = self._score_knn(*self._user_ratings(idx))
+
+        return np.clip(scores, *self.rating_scale, out=scores)
+
+    def generate_recommendations(self, inputs, n_recommendations=5, ratings=None):
+        """Top-N unrated items for a known user, or for an ad-hoc ratings vector"""
+        user_id = str((inputs or {}).get(self.user_col, '')).strip()
+
+        if user_id in self.user_to_idx:
+            user_idx = self.user_to_idx[user_id]
+            item_idx, values = self._user_ratings(user_idx)
+            if self.algorithm == 'svd':
+                scores = self._score_svd(self.arrays['user_factors'][user_idx], self.arrays['user_bias'][user_idx])
+            else:
+                scores = self._rescore_exact(self._score_knn(item_idx, values), item_idx, values, n_recommendations)
+        elif ratings:
+            item_idx, values = self._parse_ratings(ratings)
+            if self.algorithm == 'svd':
+                scores = self._score_svd(*self._fold_in_user(item_idx, values))
+            else:
+                scores = self._rescore_exact(self._score_knn(item_idx, values), item_idx, values, n_recommendations)
+        else:
+            raise ValueError(f"Unknown {self.user_col} '{user_id}' and no ratings given")
+
+        scores = np.clip(scores, *self.rating_scale)
+        scores[item_idx] = -np.inf
+        top = _top_k(scores, min(n_recommendations, len(scores) - len(np.unique(item_idx))))
+
+        return [
+            {'output_value': str(self.item_names[idx]), 'score': float(scores[idx])}
+            for idx in top
+        ]
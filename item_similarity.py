@@ -0,0 +1,142 @@
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from sklearn.neighbors import NearestNeighbors
+from title_index import TitleIndex
+
+# Title matches scoring below this are treated as "not found" rather than a guess
+MIN_TITLE_SIMILARITY = 0.55
+
+
+class ItemSimilarityRecommender:
+    """Item-to-item KNN recommender over a sparse item x user rating matrix"""
+
+    def __init__(self, ratings, items=None, user_col='userId', item_col='movieId', rating_col='rating',
+                 title_col='title', min_item_votes=10, min_user_votes=50, metric='cosine', n_neighbors=20):
+        print("Initializing ItemSimilarityRecommender...")
+        self.user_col = user_col
+        self.item_col = item_col
+        self.rating_col = rating_col
+        self.title_col = title_col
+        self.metric = metric
+        self.n_neighbors = n_neighbors
+
+        self._build_matrix(ratings, min_item_votes, min_user_votes)
+        self._build_titles(items)
+
+        self.model = NearestNeighbors(metric=metric, algorithm='brute', n_neighbors=n_neighbors, n_jobs=-1)
+        self.model.fit(self.matrix)
+        print(f"Item matrix shape: {self.matrix.shape}")
+
+    def _build_matrix(self, ratings, min_item_votes, min_user_votes):
+        """Build the filtered CSR matrix straight from (row, col, value) arrays"""
+        try:
+            ratings = ratings.drop_duplicates([self.user_col, self.item_col], keep='last')
+            item_codes, item_ids = pd.factorize(ratings[self.item_col], sort=True)
+            user_codes, user_ids = pd.factorize(ratings[self.user_col], sort=True)
+
+            # Keep items and users with enough votes, counted over all ratings
+            item_votes = np.bincount(item_codes, minlength=len(item_ids))
+            user_votes = np.bincount(user_codes, minlength=len(user_ids))
+            kept_items = np.flatnonzero(item_votes > min_item_votes)
+            kept_users = np.flatnonzero(user_votes > min_user_votes)
+
+            item_rows = np.full(len(item_ids), -1, dtype=np.int64)
+            item_rows[kept_items] = np.arange(len(kept_items))
+            user_cols = np.full(len(user_ids), -1, dtype=np.int64)
+            user_cols[kept_users] = np.arange(len(kept_users))
+
+            rows = item_rows[item_codes]
+            cols = user_cols[user_codes]
+            keep = (rows >= 0) & (cols >= 0)
+
+            self.matrix = csr_matrix(
+                (
+                    pd.to_numeric(ratings[self.rating_col]).to_numpy(dtype=np.float64)[keep],
+                    (rows[keep], cols[keep])
+                ),
+                shape=(len(kept_items), len(kept_users))
+            )
+            self.item_ids = np.asarray(item_ids)[kept_items]
+            self._item_id_values = self.item_ids.tolist()  # JSON-friendly copies
+            self._build_row_map()
+
+        except Exception as e:
+            print(f"Error in _build_matrix: {str(e)}")
+            raise
+
+    def _build_row_map(self):
+        """Map item ids to matrix rows with a dense array when ids are small non-negative integers"""
+        ids = self.item_ids
+        self._integer_ids = np.issubdtype(ids.dtype, np.integer)
+        if self._integer_ids and len(ids) and ids.min() >= 0 and ids.max() < max(10 * len(ids), 1 << 20):
+            self._row_of_id = np.full(int(ids.max()) + 1, -1, dtype=np.int64)
+            self._row_of_id[ids] = np.arange(len(ids))
+            self._id_index = None
+        else:
+            self._row_of_id = None
+            self._id_index = pd.Index(ids)
+
+    def _build_titles(self, items):
+        """Attach display titles and a title index to the matrix rows"""
+        if items is not None and self.title_col in items.columns:
+            titles = items.drop_duplicates(self.item_col).set_index(self.item_col)[self.title_col]
+            titles = titles.reindex(self.item_ids)
+            self.titles = np.where(titles.isna(), self.item_ids.astype(str), titles.astype(str))
+        else:
+            self.titles = self.item_ids.astype(str)
+        self.title_index = TitleIndex(self.titles)
+
+    def rows_for(self, item_ids):
+        """Matrix rows for a batch of item ids (-1 where the id is unknown or filtered out)"""
+        ids = np.asarray(item_ids)
+        if self._integer_ids and not np.issubdtype(ids.dtype, np.integer):
+            # Ids often arrive as strings from JSON requests
+            ids = pd.to_numeric(pd.Series(ids), errors='coerce').fillna(-1).to_numpy(dtype=np.int64)
+
+        if self._row_of_id is not None:
+            rows = np.full(len(ids), -1, dtype=np.int64)
+            valid = (ids >= 0) & (ids < len(self._row_of_id))
+            rows[valid] = self._row_of_id[ids[valid]]
+            return rows
+        return self._id_index.get_indexer(ids)
+
+    def find_item(self, query, by_id=False, min_similarity=MIN_TITLE_SIMILARITY):
+        """Matrix row of the best title match (or of an exact item id first, if by_id), or None"""
+        if by_id:
+            row = self.rows_for([query])[0]
+            if row >= 0:
+                return int(row)
+        return self.title_index.lookup(query, min_similarity=min_similarity)
+
+    def similar_to_rows(self, rows, n_recommendations=10):
+        """Nearest items for many matrix rows with a single kneighbors call"""
+        try:
+            rows = np.asarray(rows, dtype=np.int64)
+            n_neighbors = min(n_recommendations + 1, self.matrix.shape[0])
+            distances, indices = self.model.kneighbors(self.matrix[rows], n_neighbors=n_neighbors)
+
+            results = []
+            for row, row_distances, row_indices in zip(rows, distances, indices):
+                # Drop the query item itself wherever it lands among ties
+                others = row_indices != row
+                results.append([
+                    {
+                        'item_id': self._item_id_values[index],
+                        'title': str(self.titles[index]),
+                        'distance': float(distance)
+                    }
+                    for index, distance in zip(row_indices[others][:n_recommendations], row_distances[others][:n_recommendations])
+                ])
+            return results
+
+        except Exception as e:
+            print(f"Error in similar_to_rows: {str(e)}")
+            raise
+
+    def recommend(self, queries, n_recommendations=10, by_id=False):
+        """Similar items for a batch of titles (or item ids, if by_id); None for queries without a match"""
+        rows = [self.find_item(query, by_id) for query in queries]
+        found = [row for row in rows if row is not None]
+        similar = iter(self.similar_to_rows(found, n_recommendations) if found else [])
+        return [next(similar) if row is not None else None for row in rows]
@@ -0,0 +1,391 @@
+"""Load test for the recommendation API.
+
+Uploads a dataset, compiles a model and then drives /get-recommendations at
+increasing concurrency, recording latency percentiles, throughput and the
+server's RSS over time. Reports are JSON so runs can be compared:
+
+    python load_benchmark.py --start-server --rows 100000 --concurrency 1,4,16,32 --output before.json
+    python load_benchmark.py --start-server --rows 100000 --concurrency 1,4,16,32 --baseline before.json
+
+Only reports of the same workload (dataset, model and query mix) are compared.
+"""
+import os
+import io
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+import numpy as np
+import pandas as pd
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Settings that define the workload; reports differing in any of them are not comparable
+WORKLOAD_KEYS = ('system', 'algorithm', 'params', 'rows', 'sessions', 'n_recommendations', 'cold_start_ratings', 'seed')
+
+
+def build_dataset(system_type, rows, seed):
+    """CSV bytes of the requested size, tiling the bundled data with fresh ids if needed"""
+    if system_type == 'collaborative':
+        data = pd.read_csv(os.path.join(REPO_DIR, 'ratings.csv'))
+        id_col = 'userId'
+    else:
+        data = pd.read_csv(os.path.join(REPO_DIR, 'movies1.csv'))
+        id_col = 'movieId'
+
+    if rows <= len(data):
+        data = data.sample(n=rows, random_state=seed)
+    else:
+        copies = []
+        for copy in range(-(-rows // len(data))):
+            tile = data.copy()
+            tile[id_col] = tile[id_col] + copy * (data[id_col].max() + 1)
+            copies.append(tile)
+        data = pd.concat(copies, ignore_index=True).head(rows)
+
+    buffer = io.StringIO()
+    data.to_csv(buffer, index=False)
+    return data, buffer.getvalue().encode()
+
+
+def multipart_body(field, filename, content):
+    boundary = uuid.uuid4().hex
+    body = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f'Content-Type: text/csv\r\n\r\n'
+    ).encode() + content + f'\r\n--{boundary}--\r\n'.encode()
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+def call(url, body, content_type='application/json', timeout=600):
+    """POST and return (status, latency in seconds, parsed JSON or None)"""
+    if content_type == 'application/json':
+        body = json.dumps(body).encode()
+    request = urllib.request.Request(url, data=body, headers={'Content-Type': content_type})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            payload = response.read()
+            status = response.status
+    except urllib.error.HTTPError as e:
+        payload, status = e.read(), e.code
+    except (urllib.error.URLError, ConnectionError, TimeoutError):
+        return None, time.perf_counter() - started, None
+    latency = time.perf_counter() - started
+
+    try:
+        return status, latency, json.loads(payload)
+    except ValueError:
+        return status, latency, None
+
+
+def process_rss(pid):
+    """Resident memory in bytes of a process and all its descendants (Linux /proc)"""
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f'/proc/{current}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1]) * 1024
+            for task in os.listdir(f'/proc/{current}/task'):
+                with open(f'/proc/{current}/task/{task}/children') as f:
+                    pending += [int(child) for child in f.read().split()]
+        except (FileNotFoundError, ProcessLookupError, PermissionError):
+            continue
+    return total
+
+
+class RssSampler(threading.Thread):
+    """Samples the server's RSS at a fixed interval, tagged with the running phase"""
+
+    def __init__(self, pid, interval):
+        super().__init__(daemon=True)
+        self.pid = pid
+        self.interval = interval
+        self.phase = 'idle'
+        self.samples = []
+        self._stop_event = threading.Event()
+        self._started_at = time.perf_counter()
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.samples.append({
+                'time': round(time.perf_counter() - self._started_at, 3),
+                'phase': self.phase,
+                'rss_mb': round(process_rss(self.pid) / 2 ** 20, 1)
+            })
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def latency_stats(latencies):
+    """Percentiles in milliseconds"""
+    if not latencies:
+        return {'p50_ms': None, 'p90_ms': None, 'p99_ms': None, 'max_ms': None, 'mean_ms': None}
+    latencies = np.asarray(latencies) * 1000
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99])
+    return {
+        'p50_ms': round(float(p50), 2),
+        'p90_ms': round(float(p90), 2),
+        'p99_ms': round(float(p99), 2),
+        'max_ms': round(float(latencies.max()), 2),
+        'mean_ms': round(float(latencies.mean()), 2)
+    }
+
+
+def query_generator(system_type, data, ratings_per_query, seed):
+    """Returns a function building one random /get-recommendations payload per call"""
+    rng = random.Random(seed)
+    if system_type == 'collaborative':
+        users = data['userId'].astype(str).unique().tolist()
+        items = data['movieId'].astype(str).unique().tolist()
+
+        def make(session_id):
+            if ratings_per_query and rng.random() < 0.5:
+                # Cold-start users exercise the fold-in path
+                rated = rng.sample(items, min(ratings_per_query, len(items)))
+                return {'session_id': session_id, 'inputs': {},
+                        'ratings': [[item, rng.randint(1, 5)] for item in rated]}
+            return {'session_id': session_id, 'inputs': {'userId': rng.choice(users)}}
+    else:
+        genres = data['genres'].astype(str).unique().tolist()
+
+        def make(session_id):
+            return {'session_id': session_id, 'inputs': {'genres': rng.choice(genres).replace('|', ' ')}}
+    return make
+
+
+def run_level(base_url, sessions, make_query, concurrency, duration, n_recommendations):
+    """Closed loop: each worker sends its next request as soon as the previous one returns"""
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        session_id = sessions[index % len(sessions)]
+        while time.perf_counter() < deadline:
+            payload = make_query(session_id)
+            payload['n_recommendations'] = n_recommendations
+            status, latency, body = call(f'{base_url}/get-recommendations', payload)
+            ok = status == 200 and body and body.get('success')
+            with lock:
+                key = 'ok' if ok else str(status)
+                statuses[key] = statuses.get(key, 0) + 1
+                if ok:
+                    latencies.append(latency)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(index,)) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    return {
+        'concurrency': concurrency,
+        'requests': sum(statuses.values()),
+        'statuses': statuses,
+        'rejected': statuses.get('429', 0),
+        'errors': sum(count for key, count in statuses.items() if key not in ('ok', '429')),
+        'throughput_rps': round(statuses.get('ok', 0) / elapsed, 1),
+        **latency_stats(latencies)
+    }
+
+
+def start_server(port):
+    """Launch main.py without the debug reloader so the RSS belongs to one process tree"""
+    command = [sys.executable, '-c', f"import main; main.app.run(port={port}, threaded=True)"]
+    server = subprocess.Popen(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    for _ in range(120):
+        try:
+            urllib.request.urlopen(base_url + '/', timeout=1)
+            return server, base_url
+        except (urllib.error.URLError, ConnectionError):
+            if server.poll() is not None:
+                raise RuntimeError("Server exited during startup")
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError("Server did not start within 60 seconds")
+
+
+def workload_mismatch(config, baseline_config):
+    """{setting: (baseline, current)} for workload settings that differ between two runs"""
+    return {
+        key: (baseline_config.get(key), config.get(key))
+        for key in WORKLOAD_KEYS
+        if baseline_config.get(key) != config.get(key)
+    }
+
+
+def compare(report, baseline):
+    """Per-concurrency deltas of throughput and p99 against a baseline report of the same workload"""
+    mismatch = workload_mismatch(report['config'], baseline['config'])
+    if mismatch:
+        raise ValueError(f"Baseline was run with a different workload: {mismatch}")
+    previous = {level['concurrency']: level for level in baseline['recommendations']}
+    deltas = []
+    for level in report['recommendations']:
+        before = previous.get(level['concurrency'])
+        if not before or not before['p99_ms'] or not level['p99_ms']:
+            continue
+        deltas.append({
+            'concurrency': level['concurrency'],
+            'throughput_change': round(level['throughput_rps'] / max(before['throughput_rps'], 1e-9) - 1, 3),
+            'p99_change': round(level['p99_ms'] / before['p99_ms'] - 1, 3)
+        })
+    return {
+        'baseline_config': baseline['config'],
+        'levels': deltas,
+        'peak_rss_change': round(report['peak_rss_mb'] / baseline['peak_rss_mb'] - 1, 3)
+        if report.get('peak_rss_mb') and baseline.get('peak_rss_mb') else None
+    }
+
+
+def print_report(report):
+    print(f"\nUpload:  {report['upload']}")
+    print(f"Compile: {report['compile']}")
+    print(f"\n{'conc':>5} {'req/s':>9} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'max ms':>9} {'429':>6} {'err':>5}")
+    for level in report['recommendations']:
+        print(f"{level['concurrency']:>5} {level['throughput_rps']:>9} {level['p50_ms']!s:>9} {level['p90_ms']!s:>9} "
+              f"{level['p99_ms']!s:>9} {level['max_ms']!s:>9} {level['rejected']:>6} {level['errors']:>5}")
+    print(f"\nSustainable throughput at p99 <= {report['config']['slo_p99_ms']} ms: "
+          f"{report['sustainable_throughput_rps']} req/s")
+    if report.get('peak_rss_mb') is not None:
+        print(f"Peak server RSS: {report['peak_rss_mb']} MB")
+
+    for level in report.get('comparison', {}).get('levels', []):
+        print(f"vs baseline at concurrency {level['concurrency']}: "
+              f"throughput {level['throughput_change']:+.1%}, p99 {level['p99_change']:+.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://127.0.0.1:5000', help='Running server to test')
+    parser.add_argument('--start-server', action='store_true', help='Start main.py locally instead of using --url')
+    parser.add_argument('--port', type=int, default=5050, help='Port for --start-server')
+    parser.add_argument('--server-pid', type=int, help='PID to sample RSS from when using --url')
+    parser.add_argument('--system', choices=['collaborative', 'content'], default='collaborative')
+    parser.add_argument('--algorithm', default='svd')
+    parser.add_argument('--params', type=json.loads, default=None, help='JSON model params for /compile-model')
+    parser.add_argument('--rows', type=int, default=50000, help='Rows in the uploaded dataset')
+    parser.add_argument('--sessions', type=int, default=4, help='Sessions to spread load over (uploads after the first hit the cache)')
+    parser.add_argument('--concurrency', default='1,4,16,32', help='Comma-separated concurrency levels')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds per concurrency level')
+    parser.add_argument('--n-recommendations', type=int, default=10)
+    parser.add_argument('--cold-start-ratings', type=int, default=0,
+                        help='If set, half of the collaborative queries send this many ratings instead of a user id')
+    parser.add_argument('--slo-p99-ms', type=float, default=100)
+    parser.add_argument('--rss-interval', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report here')
+    parser.add_argument('--baseline', help='Earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        # Checked before the run, not after it
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatch = workload_mismatch(vars(args), baseline['config'])
+        if mismatch:
+            parser.error(f"--baseline was run with a different workload {{setting: (baseline, now)}}: {mismatch}")
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    server = None
+    if args.start_server:
+        server, base_url = start_server(args.port)
+        server_pid = server.pid
+    else:
+        base_url, server_pid = args.url.rstrip('/'), args.server_pid
+
+    sampler = RssSampler(server_pid, args.rss_interval) if server_pid else None
+    if sampler:
+        sampler.start()
+
+    try:
+        data, csv_bytes = build_dataset(args.system, args.rows, args.seed)
+        print(f"Dataset: {len(data)} {args.system} rows, {len(csv_bytes) / 2 ** 20:.1f} MB")
+
+        # Upload and compile once per session; repeats measure the cached path
+        if sampler:
+            sampler.phase = 'upload'
+        sessions, upload_times = [], []
+        for _ in range(args.sessions):
+            body, content_type = multipart_body('file', f'load_benchmark_{args.system}.csv', csv_bytes)
+            status, latency, response = call(f'{base_url}/upload-data', body, content_type)
+            if not response or not response.get('success'):
+                raise RuntimeError(f"Upload failed ({status}): {response}")
+            sessions.append(response['session_id'])
+            upload_times.append(latency)
+
+        if sampler:
+            sampler.phase = 'compile'
+        if args.system == 'collaborative':
+            compile_payload = {'system_type': 'collaborative', 'algorithm': args.algorithm,
+                               'inputs': [{'column': 'userId'}, {'column': 'movieId'}],
+                               'output': {'column': 'rating'}}
+        else:
+            compile_payload = {'system_type': 'content', 'inputs': [{'column': 'genres'}],
+                               'output': {'column': 'title'}}
+        compile_payload['params'] = args.params
+        compile_times = []
+        for session_id in sessions:
+            status, latency, response = call(f'{base_url}/compile-model', dict(compile_payload, session_id=session_id))
+            if not response or not response.get('success'):
+                raise RuntimeError(f"Compile failed ({status}): {response}")
+            compile_times.append(latency)
+
+        make_query = query_generator(args.system, data, args.cold_start_ratings, args.seed)
+        results = []
+        for concurrency in levels:
+            if sampler:
+                sampler.phase = f'recommend@{concurrency}'
+            results.append(run_level(base_url, sessions, make_query, concurrency, args.duration, args.n_recommendations))
+            print(f"concurrency {concurrency}: {results[-1]['throughput_rps']} req/s, p99 {results[-1]['p99_ms']} ms")
+
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            server.wait()
+
+    within_slo = [level['throughput_rps'] for level in results
+                  if level['p99_ms'] is not None and level['p99_ms'] <= args.slo_p99_ms and not level['errors']]
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'upload': {'first_ms': round(upload_times[0] * 1000, 1),
+                   'cached_ms': latency_stats(upload_times[1:])['p50_ms']},
+        'compile': {'first_ms': round(compile_times[0] * 1000, 1),
+                    'cached_ms': latency_stats(compile_times[1:])['p50_ms']},
+        'recommendations': results,
+        'sustainable_throughput_rps': max(within_slo) if within_slo else 0.0,
+        'peak_rss_mb': max(sample['rss_mb'] for sample in sampler.samples) if sampler and sampler.samples else None,
+        'rss': sampler.samples if sampler else []
+    }
+    if baseline:
+        report['comparison'] = compare(report, baseline)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -3,19 +3,36 @@ from flask_cors import CORS
 import os
 import json
 import pandas as pd
-from recommender import RecommenderSystem
-import threading
-import io
+from recommender import RecommenderSystem, render_visualizations
+from evaluation import evaluate_models, evaluation_cache_key
+from tuning import tune_collaborative_model
+from item_similarity import ItemSimilarityRecommender
+from dataset_cache import DatasetCache
+from model_export import export_model_bundle
+from scheduler import RequestScheduler, SchedulerBusyError, PRIORITY_HIGH
 import uuid
 
 app = Flask(__name__)
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Add thread lock for visualization generation
-visualization_lock = threading.Lock()
-
 recommendation_systems = {}
 
+# Parsed uploads and compiled models, keyed by content hash and shared across sessions
+dataset_cache = DatasetCache()
+
+# Separate worker pools for training, rendering, serving and background jobs, with per-session caps;
+# training and rendering run in worker processes so they never hold this process's GIL
+scheduler = RequestScheduler()
+
+def busy_response(error):
+    """429 with a retry hint when the scheduler applies back-pressure"""
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'retry_after': error.retry_after
+    })
+    return response, 429, {'Retry-After': str(error.retry_after)}
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -32,8 +49,8 @@ def upload_data():
         if file.filename == '':
             return jsonify({'success': False, 'error': 'No selected file'})
             
-        # Read the CSV file
-        df = pd.read_csv(file)
+        # Hash the CSV while it streams in, parsing it only if these bytes are new
+        data_hash, df, cached = dataset_cache.read_upload(file.stream)
         
         # Generate session ID
         session_id = str(abs(hash(file.filename + str(pd.Timestamp.now()))))
@@ -41,6 +58,7 @@ def upload_data():
         # Store the data
         recommendation_systems[session_id] = {
             'data': df,
+            'data_hash': data_hash,
             'columns': df.columns.tolist()
         }
         
@@ -48,6 +66,8 @@ def upload_data():
             'success': True,
             'session_id': session_id,
             'columns': df.columns.tolist(),
+            'data_hash': data_hash,
+            'cached': cached,
             'message': 'Data uploaded successfully'
         })
         
@@ -65,6 +85,7 @@ def compile_model():
         session_id = data.get('session_id')
         system_type = data.get('system_type')
         algorithm = data.get('algorithm', 'svd')
+        params = data.get('params')
         inputs = data.get('inputs', [])
         output = data.get('output')
         
@@ -79,6 +100,9 @@ def compile_model():
         session_data = recommendation_systems[session_id]
         df = session_data['data']
         
+        # Derived item-similarity model belongs to the previous compilation
+        session_data.pop('item_similarity', None)
+        
         if system_type == 'collaborative':
             try:
                 # Validate required columns
@@ -106,21 +130,37 @@ def compile_model():
                 
                 print(f"Selected columns for collaborative filtering: {selected_columns}")
                 
-                # Initialize recommender system
-                recommender = RecommenderSystem(
-                    data=df,
-                    system_type='collaborative',
-                    columns=selected_columns,
-                    algorithm=algorithm
+                # Reuse a model compiled from identical data and settings, if any
+                model_key = DatasetCache.model_key(
+                    session_data.get('data_hash'), 'collaborative', selected_columns, algorithm, params
                 )
+                recommender = dataset_cache.get_model(model_key)
+                
+                if recommender is None:
+                    # Initialize recommender system
+                    recommender = scheduler.run(
+                        'training', session_id, RecommenderSystem,
+                        data=df,
+                        system_type='collaborative',
+                        columns=selected_columns,
+                        algorithm=algorithm,
+                        params=params
+                    )
+                    dataset_cache.put_model(model_key, recommender)
+                else:
+                    print("Reusing cached collaborative model")
                 
                 # Store the compiled model
+                recommendation_systems[session_id]['shared_model'] = model_key is not None
                 recommendation_systems[session_id]['recommender'] = recommender
                 recommendation_systems[session_id]['columns'] = selected_columns
                 recommendation_systems[session_id]['algorithm'] = algorithm
+                recommendation_systems[session_id]['params'] = recommender.params
                 
                 print(f"Collaborative model ({algorithm}) compiled successfully")
                 
+            except SchedulerBusyError as e:
+                return busy_response(e)
             except Exception as e:
                 print(f"Error in collaborative model compilation: {str(e)}")
                 return jsonify({
@@ -130,19 +170,35 @@ def compile_model():
         else:
             # Content-based compilation
             selected_columns = [col['column'] for col in inputs] + [output['column']]
-            recommender = RecommenderSystem(
-                data=df,
-                system_type=system_type,
-                columns=selected_columns
+            model_key = DatasetCache.model_key(
+                session_data.get('data_hash'), system_type, selected_columns, params=params
             )
+            recommender = dataset_cache.get_model(model_key)
+            
+            if recommender is None:
+                recommender = scheduler.run(
+                    'training', session_id, RecommenderSystem,
+                    data=df,
+                    system_type=system_type,
+                    columns=selected_columns,
+                    params=params
+                )
+                dataset_cache.put_model(model_key, recommender)
+            else:
+                print("Reusing cached content model")
+            
+            recommendation_systems[session_id]['shared_model'] = model_key is not None
             recommendation_systems[session_id]['recommender'] = recommender
         
         return jsonify({
             'success': True,
             'message': 'Model compilation successful',
-            'session_id': session_id
+            'session_id': session_id,
+            'serving_report': getattr(recommender, 'serving_report', None)
         })
         
+    except SchedulerBusyError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Error in compile_model: {str(e)}")
         import traceback
@@ -162,6 +218,8 @@ def get_recommendations():
         session_id = data.get('session_id')
         inputs = data.get('inputs')
         n_recommendations = data.get('n_recommendations', 5)
+        ratings = data.get('ratings')  # Optional (item, rating) pairs for users unseen in training
+        diversity = data.get('diversity')  # Optional 0-1 weight overriding the model's re-ranking setting
         
         print(f"Session ID: {session_id}")
         print(f"Inputs: {inputs}")
@@ -180,9 +238,14 @@ def get_recommendations():
                 'error': 'Model not compiled for this session'
             })
         
-        recommendations = recommender.generate_recommendations(
+        # Latency-sensitive: served ahead of other queued lookups
+        recommendations = scheduler.run(
+            'serving', session_id, recommender.generate_recommendations,
+            priority=PRIORITY_HIGH,
             inputs=inputs,
-            n_recommendations=n_recommendations
+            n_recommendations=n_recommendations,
+            ratings=ratings,
+            diversity=diversity
         )
         
         return jsonify({
@@ -190,6 +253,8 @@ def get_recommendations():
             'recommendations': recommendations
         })
         
+    except SchedulerBusyError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Error in get_recommendations: {str(e)}")
         import traceback
@@ -199,6 +264,330 @@ def get_recommendations():
             'error': str(e)
         }), 500
 
+@app.route('/add-items', methods=['POST'])
+def add_items():
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        rows = data.get('rows', [])
+        
+        if not session_id or session_id not in recommendation_systems:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid session ID or no model compiled'
+            })
+        
+        recommender = recommendation_systems[session_id].get('recommender')
+        if not recommender:
+            return jsonify({
+                'success': False,
+                'error': 'Model not compiled for this session'
+            })
+        
+        if not rows:
+            return jsonify({
+                'success': False,
+                'error': 'No rows provided'
+            })
+        
+        # add_items builds a new model and leaves the current one (possibly shared through the
+        # cache, possibly being read by in-flight requests) untouched; swap it in with one assignment
+        recommender = scheduler.run('background', session_id, recommender.add_items, rows)
+        recommendation_systems[session_id]['recommender'] = recommender
+        recommendation_systems[session_id]['shared_model'] = False
+        recommendation_systems[session_id]['data'] = recommender.data
+        recommendation_systems[session_id]['data_hash'] = None
+        # Evaluations were computed on the previous rows
+        recommendation_systems[session_id]['data_version'] = recommendation_systems[session_id].get('data_version', 0) + 1
+        recommendation_systems[session_id].pop('evaluations', None)
+        
+        return jsonify({
+            'success': True,
+            'added': len(rows),
+            'total_items': len(recommender.data)
+        })
+        
+    except SchedulerBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error in add_items: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/autocomplete', methods=['GET'])
+def autocomplete():
+    try:
+        session_id = request.args.get('session_id')
+        query = request.args.get('q', '')
+        limit = min(int(request.args.get('limit', 10)), 50)
+        
+        if not session_id or session_id not in recommendation_systems:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid session ID or no model compiled'
+            })
+        
+        recommender = recommendation_systems[session_id].get('recommender')
+        if not recommender:
+            return jsonify({
+                'success': False,
+                'error': 'Model not compiled for this session'
+            })
+        
+        return jsonify({
+            'success': True,
+            'suggestions': scheduler.run('serving', session_id, recommender.title_index.autocomplete, query, limit)
+        })
+        
+    except SchedulerBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error in autocomplete: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/evaluate', methods=['POST'])
+def evaluate():
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        inputs = data.get('inputs', [])
+        output = data.get('output')
+        algorithms = data.get('algorithms') or [data.get('algorithm', 'svd')]
+        split = data.get('split', 'random')
+        n_folds = int(data.get('n_folds', 5))
+        k = int(data.get('k', 10))
+        threshold = float(data.get('threshold', 4.0))
+        timestamp_col = data.get('timestamp_column', 'timestamp')
+        seed = int(data.get('seed', 42))
+        
+        print(f"Received evaluation request for session: {session_id}")
+        
+        if not session_id or session_id not in recommendation_systems:
+            return jsonify({
+                'success': False,
+                'error': 'No dataset uploaded. Please upload datasets first.'
+            })
+        
+        if len(inputs) < 2 or not output:
+            return jsonify({
+                'success': False,
+                'error': 'Evaluation requires user_id, item_id, and rating columns'
+            })
+        
+        session_data = recommendation_systems[session_id]
+        df = session_data['data']
+        
+        # Same column order as collaborative compilation: [user_id, item_id, rating]
+        selected_columns = [inputs[0]['column'], inputs[1]['column'], output['column']]
+        if split == 'time':
+            data_columns = selected_columns + [timestamp_col]
+        else:
+            data_columns = selected_columns
+        
+        missing = [col for col in data_columns if col not in df.columns]
+        if missing:
+            return jsonify({
+                'success': False,
+                'error': f'Columns not found in dataset: {missing}'
+            })
+        
+        # Results are cached per model configuration within the session
+        cache = session_data.setdefault('evaluations', {})
+        keys = {
+            algorithm: evaluation_cache_key(
+                selected_columns, algorithm, split, n_folds, k, threshold, seed,
+                timestamp_col=timestamp_col,
+                data_version=(session_data.get('data_hash'), session_data.get('data_version', 0))
+            )
+            for algorithm in algorithms
+        }
+        pending = [algorithm for algorithm in algorithms if keys[algorithm] not in cache]
+        
+        if pending:
+            # Folds already train in their own processes
+            results = scheduler.run(
+                'background', session_id, evaluate_models,
+                df[data_columns],
+                selected_columns,
+                algorithms=pending,
+                split=split,
+                n_folds=n_folds,
+                k=k,
+                threshold=threshold,
+                timestamp_col=timestamp_col,
+                seed=seed
+            )
+            for algorithm, result in results.items():
+                cache[keys[algorithm]] = result
+        
+        return jsonify({
+            'success': True,
+            'results': {algorithm: cache[keys[algorithm]] for algorithm in algorithms},
+            'cached': [algorithm for algorithm in algorithms if algorithm not in pending]
+        })
+        
+    except SchedulerBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error in evaluate: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/tune-model', methods=['POST'])
+def tune_model():
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        inputs = data.get('inputs', [])
+        output = data.get('output')
+        algorithm = data.get('algorithm', 'svd')
+        search = data.get('search', 'halving')
+        
+        print(f"Received tuning request for session: {session_id}")
+        
+        if not session_id or session_id not in recommendation_systems:
+            return jsonify({
+                'success': False,
+                'error': 'No dataset uploaded. Please upload datasets first.'
+            })
+        
+        if len(inputs) < 2 or not output:
+            return jsonify({
+                'success': False,
+                'error': 'Tuning requires user_id, item_id, and rating columns'
+            })
+        
+        df = recommendation_systems[session_id]['data']
+        selected_columns = [inputs[0]['column'], inputs[1]['column'], output['column']]
+        
+        # Trials already train in their own processes
+        tuning = scheduler.run(
+            'background', session_id, tune_collaborative_model,
+            df[selected_columns],
+            selected_columns,
+            algorithm=algorithm,
+            search=search,
+            param_grid=data.get('param_grid'),
+            validation_size=float(data.get('validation_size', 0.2)),
+            seed=int(data.get('seed', 42))
+        )
+        
+        # Compile the winning configuration on the full dataset
+        recommender = scheduler.run(
+            'training', session_id, RecommenderSystem,
+            data=df,
+            system_type='collaborative',
+            columns=selected_columns,
+            algorithm=algorithm,
+            params=tuning['best_params']
+        )
+        
+        model_key = DatasetCache.model_key(
+            recommendation_systems[session_id].get('data_hash'), 'collaborative',
+            selected_columns, algorithm, tuning['best_params']
+        )
+        dataset_cache.put_model(model_key, recommender)
+        
+        recommendation_systems[session_id].pop('item_similarity', None)
+        recommendation_systems[session_id]['shared_model'] = model_key is not None
+        recommendation_systems[session_id]['recommender'] = recommender
+        recommendation_systems[session_id]['columns'] = selected_columns
+        recommendation_systems[session_id]['algorithm'] = algorithm
+        recommendation_systems[session_id]['params'] = tuning['best_params']
+        
+        print(f"Collaborative model ({algorithm}) tuned and compiled successfully")
+        
+        return jsonify({
+            'success': True,
+            'message': 'Model tuning and compilation successful',
+            'session_id': session_id,
+            'best_params': tuning['best_params'],
+            'best_rmse': tuning['best_rmse'],
+            'trials': tuning['trials']
+        })
+        
+    except SchedulerBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error in tune_model: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/similar-items', methods=['POST'])
+def similar_items():
+    try:
+        data = request.get_json()
+        session_id = data.get('session_id')
+        items = data.get('items') or [data.get('item')]
+        n_recommendations = int(data.get('n_recommendations', 10))
+        by_id = bool(data.get('by_id', False))  # Treat items as ids before trying titles
+        
+        if not session_id or session_id not in recommendation_systems:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid session ID or no model compiled'
+            })
+        
+        session_data = recommendation_systems[session_id]
+        similarity = session_data.get('item_similarity')
+        
+        if similarity is None:
+            recommender = session_data.get('recommender')
+            if not recommender or recommender.system_type != 'collaborative':
+                return jsonify({
+                    'success': False,
+                    'error': 'Compile a collaborative model for this session first'
+                })
+            
+            df = session_data['data']
+            similarity = scheduler.run(
+                'training', session_id, ItemSimilarityRecommender,
+                df,
+                items=df,
+                user_col=recommender.user_col,
+                item_col=recommender.item_col,
+                rating_col=recommender.rating_col,
+                min_item_votes=int(data.get('min_item_votes', 10)),
+                min_user_votes=int(data.get('min_user_votes', 50))
+            )
+            session_data['item_similarity'] = similarity
+        
+        results = scheduler.run(
+            'serving', session_id, similarity.recommend,
+            [str(item) for item in items if item], n_recommendations, by_id
+        )
+        
+        return jsonify({
+            'success': True,
+            'recommendations': results
+        })
+        
+    except SchedulerBusyError as e:
+        return busy_response(e)
+    except Exception as e:
+        print(f"Error in similar_items: {str(e)}")
+        import traceback
+        print(traceback.format_exc())
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/get-visualizations', methods=['POST'])
 def get_visualizations():
     try:
@@ -223,24 +612,22 @@ def get_visualizations():
         df = session_data['data']
         print(f"Retrieved DataFrame with shape: {df.shape}")
         
-        # Use thread lock for visualization generation
-        with visualization_lock:
-            print("Creating RecommenderSystem instance...")
-            system = RecommenderSystem(df, 'content', df.columns.tolist())
-            
-            print("Generating visualizations...")
-            visualizations = system.generate_visualizations()
-            print("Visualizations generated successfully")
-            
-            # Verify visualization data
-            for viz_name, viz_data in visualizations.items():
-                print(f"Visualization '{viz_name}' data length: {len(viz_data) if viz_data else 0}")
+        # Rendered in a worker process (each has its own pyplot state), returned as base64 PNGs
+        print("Generating visualizations...")
+        visualizations = scheduler.run('rendering', session_id, render_visualizations, df)
+        print("Visualizations generated successfully")
+        
+        # Verify visualization data
+        for viz_name, viz_data in visualizations.items():
+            print(f"Visualization '{viz_name}' data length: {len(viz_data) if viz_data else 0}")
         
         return jsonify({
             'success': True,
             'visualizations': visualizations
         })
         
+    except SchedulerBusyError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Error in get_visualizations: {str(e)}")
         import traceback
@@ -254,124 +641,34 @@ def get_visualizations():
 def export_model():
     try:
         data = request.get_json()
-        system_type = data.get('system_type')
-        input_columns = data.get('input_columns')
-        output_column = data.get('output_column')
-        
-        # Create the complete model code with user configurations
-        model_code = f'''import matplotlib
-matplotlib.use('Agg')  # Set the backend to Agg before importing pyplot
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
-from scipy.sparse.linalg import svds
-import io
-import base64
-
-class RecommenderSystem:
-    def __init__(self, data):
-        self.data = data
-        self.system_type = "{system_type}"
-        self.input_columns = {input_columns}
-        self.output_column = "{output_column}"
-        self._preprocess_data()
-        
-        # Set style for plots
-        plt.style.use('default')
-        sns.set_theme(style="whitegrid")
-    
-    def _preprocess_data(self):
-        """Preprocess the data for better recommendations"""
-        try:
-            # Convert all text to lowercase for better matching
-            for col in self.input_columns:
-                if self.data[col].dtype == 'object':
-                    self.data[col] = self.data[col].str.lower()
-            
-            # Create TF-IDF vectorizer for text columns
-            self.tfidf = TfidfVectorizer(
-                stop_words='english',
-                ngram_range=(1, 2),
-                max_features=5000,
-                strip_accents='unicode',
-                analyzer='word'
-            )
-            
-            # Combine all input columns for feature creation
-            self.text_features = self.data[self.input_columns].astype(str).agg(' '.join, axis=1)
-            self.tfidf_matrix = self.tfidf.fit_transform(self.text_features)
-            
-        except Exception as e:
-            print(f"Error in preprocessing: {{str(e)}}")
-            raise
-
-    def generate_recommendations(self, inputs, n_recommendations=5):
-        """Generate recommendations based on input values"""
-        try:
-            # Preprocess input
-            input_text = ' '.join(str(v).lower() for v in inputs.values())
-            
-            # Transform input using the same TF-IDF vectorizer
-            input_vector = self.tfidf.transform([input_text])
-            
-            # Calculate cosine similarities
-            similarities = cosine_similarity(input_vector, self.tfidf_matrix)[0]
-            
-            # Get indices of top N similar items
-            similar_indices = []
-            sorted_indices = similarities.argsort()[::-1]
-            
-            # Filter recommendations
-            seen_outputs = set()
-            for idx in sorted_indices:
-                output_value = str(self.data.iloc[idx][self.output_column]).lower()
-                similarity = similarities[idx]
-                
-                # Skip if similarity is too low or we've seen this output
-                if similarity < 0.1:
-                    continue
-                if output_value in seen_outputs:
-                    continue
-                    
-                similar_indices.append(idx)
-                seen_outputs.add(output_value)
-                
-                if len(similar_indices) >= n_recommendations:
-                    break
-            
-            # Format recommendations
-            recommendations = []
-            for idx in similar_indices:
-                output_value = self.data.iloc[idx][self.output_column]
-                similarity = similarities[idx]
-                
-                recommendations.append({{
-                    'output_value': str(output_value),
-                    'score': float(similarity)
-                }})
-            
-            return recommendations
-            
-        except Exception as e:
-            print(f"Error generating recommendations: {{str(e)}}")
-            raise
-'''
+        session_id = data.get('session_id')
+        
+        if not session_id or session_id not in recommendation_systems:
+            return jsonify({
+                'success': False,
+                'error': 'Invalid session ID or no model compiled'
+            })
+        
+        recommender = recommendation_systems[session_id].get('recommender')
+        if not recommender:
+            return jsonify({
+                'success': False,
+                'error': 'Model not compiled for this session'
+            })
         
-        # Create a BytesIO object to hold the file
-        buffer = io.BytesIO()
-        buffer.write(model_code.encode())
-        buffer.seek(0)
+        # Arrays, id maps and runtime.py; loads with runtime.load_model() without retraining
+        # Written to a temporary file that send_file streams and closes
+        bundle_file = scheduler.run('background', session_id, export_model_bundle, recommender)
         
         return send_file(
-            buffer,
-            mimetype='text/x-python',
+            bundle_file,
+            mimetype='application/zip',
             as_attachment=True,
-            download_name='recommender_model.py'
+            download_name='recommender_model.zip'
         )
         
+    except SchedulerBusyError as e:
+        return busy_response(e)
     except Exception as e:
         print(f"Error in export_model: {str(e)}")
         return jsonify({
@@ -463,5 +760,5 @@ def upload_multiple():
         }), 500
 
 if __name__ == '__main__':
-    # Disable threading in development
-    app.run(debug=True, port=5000, threaded=False)
\ No newline at end of file
+    # Threaded server: the scheduler's pools bound how much work runs at once
+    app.run(debug=True, port=5000, threaded=True)
\ No newline at end of file
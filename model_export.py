@@ -0,0 +1,177 @@
+import os
+import json
+import zipfile
+import tempfile
+import numpy as np
+from serving import QuantizedMatrix
+from text_features import StreamingTfidf
+import export_runtime
+
+# Tokenizer settings the runtime needs to vectorize queries the same way
+VECTORIZER_OPTIONS = ('lowercase', 'strip_accents', 'stop_words', 'token_pattern', 'ngram_range', 'analyzer')
+
+
+class _RowBlocks:
+    """2-D array stand-in whose rows are produced a block at a time, as it is written"""
+
+    def __init__(self, shape, dtype, block_fn):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.ndim = 2
+        self.block_fn = block_fn
+
+    def __getitem__(self, rows):
+        return self.block_fn(rows.start, rows.stop)
+
+
+def _write_array(fileobj, array, block_rows=1024):
+    """Write an array in .npy format a block of rows at a time, never copying it whole"""
+    np.lib.format.write_array_header_1_0(fileobj, {
+        'descr': np.lib.format.dtype_to_descr(array.dtype),
+        'fortran_order': False,
+        'shape': array.shape
+    })
+    if array.ndim < 2:
+        fileobj.write(np.ascontiguousarray(array).tobytes())
+        return
+    for start in range(0, array.shape[0], block_rows):
+        fileobj.write(np.ascontiguousarray(array[start:start + block_rows], dtype=array.dtype).tobytes())
+
+
+def _vectorizer_options(vectorizer):
+    return {name: getattr(vectorizer, name) for name in VECTORIZER_OPTIONS}
+
+
+def _content_arrays(recommender):
+    """Inverted index of the TF-IDF matrix plus what is needed to vectorize queries"""
+    if isinstance(recommender.tfidf, StreamingTfidf):
+        vectorizer = {
+            'kind': 'hashing',
+            'n_features': recommender.tfidf.vectorizer.n_features,
+            'options': _vectorizer_options(recommender.tfidf.vectorizer)
+        }
+        idf = recommender.tfidf.idf
+        ids = {}
+    else:
+        vectorizer = {'kind': 'vocabulary', 'options': _vectorizer_options(recommender.tfidf)}
+        idf = recommender.tfidf.idf_
+        vocabulary = recommender.tfidf.vocabulary_
+        terms = [None] * len(vocabulary)
+        for term, column in vocabulary.items():
+            terms[column] = term
+        ids = {'vocabulary': terms}
+
+    # Term-major layout: a query only reads the posting lists of its own terms
+    by_term = recommender.tfidf_matrix.tocsc()
+    by_term.sort_indices()
+
+    outputs = recommender.data[recommender.output_column].astype(str)
+    label_codes, labels = outputs.factorize()
+    dedupe_codes, _ = outputs.str.lower().factorize()
+    ids['labels'] = labels.tolist()
+
+    arrays = {
+        'idf': np.asarray(idf, dtype=np.float64),
+        'term_indptr': by_term.indptr.astype(np.int64),
+        'term_rows': by_term.indices.astype(np.int32),
+        'term_weights': by_term.data.astype(np.float32),
+        'label_codes': label_codes.astype(np.int32),
+        'dedupe_codes': dedupe_codes.astype(np.int32)
+    }
+    manifest = {'vectorizer': vectorizer, 'output_column': recommender.output_column}
+    return manifest, ids, arrays
+
+
+def _collaborative_arrays(recommender):
+    """Serving arrays in item_idx / user_idx order, plus every user's ratings as CSR"""
+    algorithm = 'svd' if recommender.algorithm.lower() == 'svd' else 'knn'
+    n_items = len(recommender.item_to_idx)
+    n_users = len(recommender.user_to_idx)
+
+    # Stable sort keeps each user's ratings in training order, which KNN tie-breaking relies on
+    user_idx = recommender.processed_data['user_idx'].to_numpy()
+    order = np.argsort(user_idx, kind='stable')
+    arrays = {
+        'user_indptr': np.concatenate([[0], np.cumsum(np.bincount(user_idx, minlength=n_users))]).astype(np.int64),
+        'user_items': recommender.processed_data['item_idx'].to_numpy()[order].astype(np.int32),
+        'user_ratings': recommender.processed_data[recommender.rating_col].to_numpy(dtype=np.float64)[order]
+    }
+    manifest = {
+        'algorithm': algorithm,
+        'user_col': recommender.user_col,
+        'item_col': recommender.item_col,
+        'global_mean': float(recommender.global_mean),
+        'rating_scale': [float(value) for value in recommender.rating_scale],
+        'precision': recommender._serving_precision()
+    }
+
+    if algorithm == 'svd':
+        arrays.update({
+            'item_factors': recommender.item_factors,
+            'item_bias': recommender.item_bias,
+            'user_factors': recommender.user_factors,
+            'user_bias': recommender.user_bias
+        })
+        manifest['reg_pu'] = float(getattr(recommender.model, 'reg_pu', 0.02))
+    else:
+        if isinstance(recommender.item_sim, QuantizedMatrix):
+            arrays['item_sim_codes'] = recommender.item_sim.codes
+            arrays['item_sim_scales'] = recommender.item_sim.scales
+        elif recommender.item_sim is not None:
+            arrays['item_sim'] = recommender.item_sim
+        else:
+            # Still on the trained float64 matrix, reordered into item_idx order as it is written
+            every_item = np.arange(n_items)
+            arrays['item_sim'] = _RowBlocks(
+                (n_items, n_items), np.float64,
+                lambda start, stop: recommender._sim_block(start, stop, every_item)
+            )
+        if recommender.exact_sim is not None:
+            # Rows the runtime re-scores its best int8 candidates against; float32 keeps the bundle
+            # smaller than a float64 one
+            exact_sim = recommender.exact_sim
+            arrays['item_sim_rescore'] = _RowBlocks(exact_sim.shape, np.float32, lambda start, stop: exact_sim[start:stop])
+        manifest['k'] = int(recommender.model.k)
+        manifest['min_k'] = int(recommender.model.min_k)
+
+    ids = {
+        'item_ids': [recommender.idx_to_item[idx] for idx in range(n_items)],
+        'user_ids': [recommender.idx_to_user[idx] for idx in range(n_users)],
+        'item_names': [str(name) for name in recommender.item_names],
+        'title_keys': {key: int(position) for key, position in recommender.title_index.resolution_keys.items()}
+    }
+    return manifest, ids, arrays
+
+
+def export_model_bundle(recommender):
+    """Zip a compiled model into arrays, id maps and the standalone runtime module"""
+    try:
+        if recommender.system_type == 'collaborative':
+            manifest, ids, arrays = _collaborative_arrays(recommender)
+        else:
+            manifest, ids, arrays = _content_arrays(recommender)
+
+        manifest.update({
+            'format_version': export_runtime.FORMAT_VERSION,
+            'system_type': recommender.system_type,
+            'arrays': sorted(arrays)
+        })
+
+        # Streamed to a temporary file entry by entry, so the bundle is never held in memory
+        bundle_file = tempfile.TemporaryFile()
+        # Arrays are stored uncompressed: once extracted they are mmapped as-is
+        with zipfile.ZipFile(bundle_file, 'w', zipfile.ZIP_STORED) as bundle:
+            bundle.writestr('manifest.json', json.dumps(manifest, indent=2))
+            bundle.writestr('ids.json', json.dumps(ids))
+            for name, array in arrays.items():
+                with bundle.open(f'arrays/{name}.npy', 'w', force_zip64=True) as entry:
+                    _write_array(entry, array)
+            bundle.write(os.path.abspath(export_runtime.__file__), 'runtime.py')
+
+        print(f"Exported {recommender.system_type} model bundle: {len(arrays)} arrays, {bundle_file.tell()} bytes")
+        bundle_file.seek(0)
+        return bundle_file
+
+    except Exception as e:
+        print(f"Error in export_model_bundle: {str(e)}")
+        raise
@@ -6,13 +6,47 @@ import pandas as pd
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.feature_extraction.text import TfidfVectorizer
+from scipy.sparse import vstack
 from scipy.sparse.linalg import svds
 import io
+import os
+import copy
+import weakref
+import tempfile
 import base64
 from surprise import Dataset, Reader, SVD, KNNBasic
+from title_index import TitleIndex
+from text_features import StreamingTfidf, combine_text_columns
+from serving import SERVING_PRECISIONS, QuantizedMatrix, rescore_pool_size, serving_accuracy_report
+from reranking import RERANK_METHODS, candidate_pool_size, cosine_gram, rerank
+
+# Default hyperparameters for the collaborative models
+SVD_DEFAULT_PARAMS = {'n_factors': 100, 'n_epochs': 20, 'lr_all': 0.005, 'reg_all': 0.02}
+KNN_DEFAULT_PARAMS = {'k': 40, 'similarity': 'cosine'}
+
+
+def build_collaborative_model(algorithm, params=None):
+    """Create an untrained Surprise model, overriding defaults with params"""
+    params = params or {}
+    if algorithm.lower() == 'svd':
+        options = {**SVD_DEFAULT_PARAMS, **{key: params[key] for key in SVD_DEFAULT_PARAMS if key in params}}
+        return SVD(**options)
+    
+    # item-knn
+    options = {**KNN_DEFAULT_PARAMS, **{key: params[key] for key in KNN_DEFAULT_PARAMS if key in params}}
+    return KNNBasic(
+        k=options['k'],
+        sim_options={'name': options['similarity'], 'user_based': False}
+    )
+
+
+def render_visualizations(data):
+    """Plots of a dataset as base64 PNGs; module-level so the rendering pool can run it in a worker process"""
+    return RecommenderSystem(data, 'visualization', data.columns.tolist()).generate_visualizations()
+
 
 class RecommenderSystem:
-    def __init__(self, data, system_type, columns, algorithm='svd'):
+    def __init__(self, data, system_type, columns, algorithm='svd', params=None):
         print(f"Initializing RecommenderSystem with:")
         print(f"- Data shape: {data.shape}")
         print(f"- System type: {system_type}")
@@ -22,13 +56,19 @@ class RecommenderSystem:
         self.data = data
         self.system_type = system_type
         self.algorithm = algorithm
+        self.params = params or {}
+        self._diversity_weight(None)  # Reject bad re-ranking settings now, not on every request
         
         if system_type == 'collaborative':
             # For collaborative filtering, expect [user_id, item_id, rating]
             self.user_col = columns[0]
             self.item_col = columns[1]
             self.rating_col = columns[2]
+            self._serving_precision()  # Fail before training, not after
             self._init_collaborative_model()
+        elif system_type == 'visualization':
+            # Plots only read self.data, skip fitting and indexing the catalog
+            pass
         else:
             # Existing content-based initialization
             self.input_columns = columns[:-1]
@@ -84,15 +124,14 @@ class RecommenderSystem:
             trainset = data.build_full_trainset()
             
             # Initialize and train model based on algorithm choice
-            if self.algorithm.lower() == 'svd':
-                self.model = SVD(n_factors=100, n_epochs=20, lr_all=0.005, reg_all=0.02)
-            else:  # item-knn
-                self.model = KNNBasic(sim_options={'name': 'cosine', 'user_based': False})
+            self.model = build_collaborative_model(self.algorithm, self.params)
             
             print(f"Training {self.algorithm} model...")
             self.model.fit(trainset)
             print("Model training completed")
             
+            self._build_collaborative_index(trainset)
+            
         except Exception as e:
             print(f"Error in _init_collaborative_model: {str(e)}")
             raise
@@ -100,23 +139,36 @@ class RecommenderSystem:
     def _preprocess_data(self):
         """Preprocess the data for better recommendations"""
         try:
-            # Convert all text to lowercase for better matching
-            for col in self.input_columns:
-                if self.data[col].dtype == 'object':
-                    self.data[col] = self.data[col].str.lower()
-            
-            # Create TF-IDF vectorizer for text columns
-            self.tfidf = TfidfVectorizer(
-                stop_words='english',
-                ngram_range=(1, 2),  # Use both unigrams and bigrams
-                max_features=5000,    # Limit features to most important ones
-                strip_accents='unicode',
-                analyzer='word'
-            )
-            
-            # Combine all input columns for feature creation
-            self.text_features = self.data[self.input_columns].astype(str).agg(' '.join, axis=1)
-            self.tfidf_matrix = self.tfidf.fit_transform(self.text_features)
+            # Combine all input columns for feature creation (the vectorizers lowercase
+            # on their own, so the session DataFrame is left untouched)
+            self.text_features = combine_text_columns(self.data, self.input_columns)
+            
+            if self.params.get('vectorizer') == 'hashing':
+                # Stateless hashing with chunked IDF: bounded memory for huge catalogs
+                self.tfidf = StreamingTfidf(
+                    n_features=int(self.params.get('n_features', 2 ** 20)),
+                    chunk_size=int(self.params.get('chunk_size', 50000)),
+                    stop_words='english',
+                    ngram_range=(1, 2),
+                    strip_accents='unicode',
+                    analyzer='word'
+                )
+                self.term_counts = self.tfidf.partial_fit(self.text_features.to_numpy())
+                self.tfidf_matrix = self.tfidf.weight(self.term_counts)
+            else:
+                # Create TF-IDF vectorizer for text columns
+                self.tfidf = TfidfVectorizer(
+                    stop_words='english',
+                    ngram_range=(1, 2),  # Use both unigrams and bigrams
+                    max_features=5000,    # Limit features to most important ones
+                    strip_accents='unicode',
+                    analyzer='word'
+                )
+                self.tfidf_matrix = self.tfidf.fit_transform(self.text_features)
+            
+            # Lookup index over the values users search for
+            self.title_index = TitleIndex(self.data[self.output_column].dropna().astype(str).unique())
+            self._encode_outputs()
             
             print("Data preprocessing completed")
             print(f"TF-IDF matrix shape: {self.tfidf_matrix.shape}")
@@ -125,6 +177,47 @@ class RecommenderSystem:
             print(f"Error in preprocessing: {str(e)}")
             raise
 
+    def _encode_outputs(self):
+        """Integer code per row for its case-insensitive output value, used to de-duplicate results"""
+        self.output_codes = pd.factorize(self.data[self.output_column].astype(str).str.lower())[0]
+
+    def add_items(self, rows):
+        """Return a copy of this content model with rows appended, without refitting it"""
+        try:
+            if self.system_type == 'collaborative':
+                raise ValueError("Adding items is only supported for content-based models")
+            
+            rows = pd.DataFrame(rows)
+            missing = [col for col in self.input_columns + [self.output_column] if col not in rows.columns]
+            if missing:
+                raise ValueError(f"New rows are missing columns: {missing}")
+            
+            new_text = combine_text_columns(rows, self.input_columns)
+            # Requests may be reading this model right now, so never mutate it in place
+            updated = copy.copy(self)
+            
+            if isinstance(self.tfidf, StreamingTfidf):
+                # Document frequencies change (in place), so update a private copy and re-weight
+                updated.tfidf = copy.deepcopy(self.tfidf)
+                new_counts = updated.tfidf.partial_fit(new_text.to_numpy())
+                updated.term_counts = vstack([self.term_counts, new_counts], format='csr')
+                updated.tfidf_matrix = updated.tfidf.weight(updated.term_counts)
+            else:
+                # Keep the fitted vocabulary and IDF, just project the new rows
+                updated.tfidf_matrix = vstack([self.tfidf_matrix, self.tfidf.transform(new_text)], format='csr')
+            
+            updated.data = pd.concat([self.data, rows], ignore_index=True)
+            updated.text_features = pd.concat([self.text_features, new_text], ignore_index=True)
+            updated.title_index = TitleIndex(updated.data[self.output_column].dropna().astype(str).unique())
+            updated._encode_outputs()
+            
+            print(f"Added {len(rows)} items, TF-IDF matrix shape: {updated.tfidf_matrix.shape}")
+            return updated
+            
+        except Exception as e:
+            print(f"Error in add_items: {str(e)}")
+            raise
+
     def generate_visualizations(self):
         """Generate a set of visualizations for the dataset"""
         print("\nStarting visualization generation...")
@@ -297,73 +390,405 @@ class RecommenderSystem:
             print(f"Error in _convert_plot_to_base64: {str(e)}")
             raise
 
-    def generate_recommendations(self, inputs, n_recommendations=5):
+    def generate_recommendations(self, inputs, n_recommendations=5, ratings=None, diversity=None):
         """Generate recommendations based on input values"""
         try:
             if self.system_type == 'collaborative':
-                return self._generate_collaborative_recommendations(inputs, n_recommendations)
+                return self._generate_collaborative_recommendations(inputs, n_recommendations, ratings, diversity)
             else:
-                return self._generate_content_recommendations(inputs, n_recommendations)
+                return self._generate_content_recommendations(inputs, n_recommendations, diversity)
                 
         except Exception as e:
             print(f"Error in generate_recommendations: {str(e)}")
             raise
 
-    def _generate_collaborative_recommendations(self, inputs, n_recommendations=5):
-        """Generate collaborative filtering recommendations"""
+    def _build_collaborative_index(self, trainset):
+        """Precompute arrays used to score every item for a user in one pass"""
         try:
-            print(f"\nGenerating collaborative recommendations for: {inputs}")
+            n_items = len(self.item_to_idx)
+            n_users = len(self.user_to_idx)
             
-            # Get the user ID from inputs using the correct column name
-            user_id = str(inputs.get(self.user_col))
+            self.trainset = trainset
+            self.global_mean = trainset.global_mean
+            self.rating_scale = trainset.rating_scale
             
-            if not user_id:
-                raise ValueError(f"Please provide a valid {self.user_col}")
+            # Surprise keeps its own inner ids, map them back to our item_idx order
+            self.item_inner = np.array([trainset.to_inner_iid(idx) for idx in range(n_items)])
+            self.user_inner = np.array([trainset.to_inner_uid(idx) for idx in range(n_users)])
+            self.inner_to_item = np.argsort(self.item_inner)
             
-            if user_id not in self.user_to_idx:
-                raise ValueError(f"User ID '{user_id}' not found in training data")
+            # Display names per item_idx (title if available, else the raw id)
+            first_rows = self.processed_data.drop_duplicates('item_idx').set_index('item_idx').sort_index()
+            name_col = 'title' if 'title' in first_rows.columns else self.item_col
+            self.item_names = first_rows[name_col].astype(str).to_numpy()
+            self.title_index = TitleIndex(self.item_names)
             
-            user_idx = self.user_to_idx[user_id]
+            if self.algorithm.lower() == 'svd':
+                self.item_factors = np.ascontiguousarray(self.model.qi[self.item_inner])
+                self.item_bias = self.model.bi[self.item_inner]
+                self.user_factors = np.ascontiguousarray(self.model.pu[self.user_inner])
+                self.user_bias = self.model.bu[self.user_inner]
+            else:
+                self.item_sim = None  # Read straight from the trained model until exported
+            self.exact_sim = None
             
-            # Get all items the user hasn't interacted with
-            user_items = set(self.processed_data[
-                self.processed_data['user_idx'] == user_idx
-            ]['item_idx'])
+            self._export_serving_model()
             
-            items_to_predict = [
-                idx for idx in range(len(self.item_to_idx)) 
-                if idx not in user_items
-            ]
+        except Exception as e:
+            print(f"Error in _build_collaborative_index: {str(e)}")
+            raise
+
+    def __getstate__(self):
+        """Pickle int8 re-score rows by file path, so a model trained in a worker process stays mmapped"""
+        state = self.__dict__.copy()
+        if isinstance(state.get('exact_sim'), np.memmap):
+            state['exact_sim'] = (state['exact_sim'].filename, state['exact_sim'].shape)
+            # Whoever unpickles the model now owns (and eventually removes) the file
+            self._exact_sim_cleanup.detach()
+            state['_exact_sim_cleanup'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if isinstance(state.get('exact_sim'), tuple):
+            self._map_exact_sim(*state['exact_sim'], 'r')
+
+    def _map_exact_sim(self, path, shape, mode):
+        """Memory-map full-precision similarity rows from a temporary file removed with this model"""
+        self.exact_sim = np.memmap(path, dtype=np.float64, mode=mode, shape=shape)
+        self._exact_sim_cleanup = weakref.finalize(self, os.remove, path)
+
+    def _serving_precision(self):
+        """Storage precision of the served model, rejecting combinations that are not supported"""
+        # float32 SVD factors score within ~1e-6 of float64; float32 KNN similarities reorder neighbours
+        default = 'float32' if self.algorithm.lower() == 'svd' else 'float64'
+        precision = self.params.get('precision', default)
+        if precision not in SERVING_PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}'. Use one of {list(SERVING_PRECISIONS)}")
+        if precision == 'int8' and self.algorithm.lower() == 'svd':
+            raise ValueError("int8 precision applies to KNN similarities only, use float32 or float64 for SVD")
+        return precision
+
+    def _export_serving_model(self, sample_size=50, n_report=10):
+        """Swap the trained float64 arrays for compact serving copies and measure the accuracy cost"""
+        try:
+            precision = self._serving_precision()
+            
+            self.serving_report = None
+            if precision == 'float64':
+                return
             
-            # Generate predictions
-            predictions = []
-            for item_idx in items_to_predict:
-                pred = self.model.predict(user_idx, item_idx)
+            # Full-precision scores for a sample of users, to report the delta against
+            n_users = len(self.user_to_idx)
+            sample = np.unique(np.linspace(0, n_users - 1, min(sample_size, n_users)).astype(np.int64))
+            sample = [self.idx_to_user[idx] for idx in sample]
+            reference = self.predict_scores(sample)
+            
+            if self.algorithm.lower() == 'svd':
+                before = sum(array.nbytes for array in (self.model.pu, self.model.qi, self.model.bu, self.model.bi))
+                
+                self.item_factors = np.ascontiguousarray(self.item_factors, dtype=np.float32)
+                self.user_factors = np.ascontiguousarray(self.user_factors, dtype=np.float32)
+                self.item_bias = self.item_bias.astype(np.float32)
+                self.user_bias = self.user_bias.astype(np.float32)
+                self.model.pu = self.model.qi = self.model.bu = self.model.bi = None
                 
-                # Get the original item ID/name
-                item_id = self.idx_to_item[item_idx]
+                after = sum(array.nbytes for array in (self.item_factors, self.user_factors, self.item_bias, self.user_bias))
+            else:
+                before = self.model.sim.nbytes
+                n_items = len(self.item_to_idx)
+                
+                # Reorder into item_idx order block by block, avoiding a second in-memory float64 copy
+                def sim_rows(start, stop):
+                    block = self.model.sim[np.ix_(self.item_inner[start:stop], self.item_inner)]
+                    if self.exact_sim is not None:
+                        self.exact_sim[start:stop] = block
+                    return block
                 
-                # If you have item details (e.g., movie titles), get them
-                item_details = self.data[self.data[self.item_col] == item_id].iloc[0]
-                item_name = item_details.get('title', item_id)  # Use title if available, else use ID
+                if precision == 'int8':
+                    # int8 reorders the best candidates, so it keeps full-precision rows to re-score them.
+                    # They go to a memory-mapped temporary file: only the pages of re-scored candidates
+                    # are read back, so they stay out of resident memory
+                    handle, path = tempfile.mkstemp(suffix='.sim')
+                    os.close(handle)
+                    self._map_exact_sim(path, (n_items, n_items), 'w+')
+                    self.item_sim = QuantizedMatrix.from_blocks(n_items, n_items, sim_rows)
+                    self.exact_sim.flush()
+                else:
+                    self.item_sim = np.empty((n_items, n_items), dtype=np.float32)
+                    for start in range(0, n_items, 1024):
+                        self.item_sim[start:start + 1024] = sim_rows(start, min(start + 1024, n_items))
+                self.model.sim = None
                 
-                predictions.append({
-                    'item_id': item_id,
-                    'item_name': item_name,
-                    'predicted_rating': pred.est
-                })
-            
-            # Sort predictions and get top N
-            predictions.sort(key=lambda x: x['predicted_rating'], reverse=True)
-            top_predictions = predictions[:n_recommendations]
-            
-            # Format recommendations
-            recommendations = []
-            for pred in top_predictions:
-                recommendations.append({
-                    'output_value': str(pred['item_name']),  # Use item name instead of ID
-                    'score': float(pred['predicted_rating'])
-                })
+                after = self.item_sim.nbytes
+            
+            # Served rankings go through the same scoring path as requests, exact re-scoring included
+            served = self.predict_scores(sample)
+            served_top, exclude = [], []
+            for row, user_id in enumerate(sample):
+                item_idx, values = self._user_ratings(self.user_to_idx[user_id])
+                scores = served[row] if self.exact_sim is None else self._rescore_exact(
+                    self._score_knn(item_idx, values), item_idx, values, n_report
+                )
+                served_top.append(self._top_indices(scores, item_idx, n_report, 0.0))
+                exclude.append(item_idx)
+            
+            self.serving_report = {
+                'precision': precision,
+                'memory_bytes_before': int(before),
+                'memory_bytes_after': int(after),
+                'memory_reduction': float(before / after) if after else 1.0,
+                'exact_rescoring': self.exact_sim is not None,
+                'mmapped_bytes': int(self.exact_sim.nbytes) if self.exact_sim is not None else 0,
+                **serving_accuracy_report(reference, served, served_top, exclude)
+            }
+            print(f"Serving model exported: {self.serving_report}")
+            
+        except Exception as e:
+            print(f"Error in _export_serving_model: {str(e)}")
+            raise
+
+    def _resolve_item(self, item):
+        """Map a raw item id or item name to its item_idx (None if unknown)"""
+        key = str(item).strip()
+        if key in self.item_to_idx:
+            return self.item_to_idx[key]
+        # A wrong guess would fold the rating into another item, so only accept unambiguous names
+        return self.title_index.resolve(key)
+
+    def _parse_ratings(self, ratings):
+        """Turn ad-hoc (item, rating) pairs into item index and rating arrays"""
+        if isinstance(ratings, dict):
+            pairs = list(ratings.items())
+        else:
+            pairs = []
+            for entry in ratings:
+                if isinstance(entry, dict):
+                    pairs.append((entry.get('item', entry.get(self.item_col)), entry.get('rating')))
+                else:
+                    pairs.append((entry[0], entry[1]))
+        
+        ratings_by_item = {}
+        for item, rating in pairs:
+            item_idx = self._resolve_item(item)
+            if item_idx is None:
+                print(f"Skipping unknown item in ratings: {item}")
+                continue
+            ratings_by_item[item_idx] = float(rating)
+        
+        if not ratings_by_item:
+            raise ValueError("None of the rated items were found in training data")
+        
+        item_idx = np.fromiter(ratings_by_item.keys(), dtype=np.int64, count=len(ratings_by_item))
+        values = np.fromiter(ratings_by_item.values(), dtype=np.float64, count=len(ratings_by_item))
+        return item_idx, values
+
+    def _fold_in_user(self, item_idx, values):
+        """Solve a regularized least-squares problem for a new user's factors and bias"""
+        # Unknowns are [pu, bu]; item factors and biases stay frozen
+        X = np.hstack([self.item_factors[item_idx].astype(np.float64), np.ones((len(item_idx), 1))])
+        y = values - self.global_mean - self.item_bias[item_idx]
+        
+        reg = getattr(self.model, 'reg_pu', 0.02) * len(item_idx)
+        A = X.T @ X + reg * np.eye(X.shape[1])
+        solution = np.linalg.solve(A, X.T @ y)
+        return solution[:-1], solution[-1]
+
+    def _score_svd(self, user_vector, user_bias):
+        """Predicted rating of every item for one user factor vector"""
+        user_vector = np.asarray(user_vector, dtype=self.item_factors.dtype)
+        return self.global_mean + user_bias + self.item_bias + self.item_factors @ user_vector
+
+    def _sim_block(self, start, stop, item_idx):
+        """Similarities between items start:stop and the given items, in item_idx order"""
+        if self.item_sim is None:
+            return self.model.sim[np.ix_(self.item_inner[start:stop], self.item_inner[item_idx])]
+        if isinstance(self.item_sim, QuantizedMatrix):
+            return self.item_sim.take(start, stop, item_idx)
+        return self.item_sim[start:stop][:, item_idx]
+
+    def _knn_predict(self, sims, values):
+        """KNNBasic predictions for rows of similarities to the rated items (columns follow values)"""
+        k = self.model.k
+        min_k = self.model.min_k
+        ratings = np.broadcast_to(values, sims.shape)
+        
+        # Keep only the k most similar rated items per row, as KNNBasic does
+        # (stable sort so ties resolve in rating order like heapq.nlargest)
+        if sims.shape[1] > k:
+            top = np.argsort(-sims, axis=1, kind='stable')[:, :k]
+            sims = np.take_along_axis(sims, top, axis=1)
+            ratings = np.take_along_axis(ratings, top, axis=1)
+        
+        positive = sims > 0
+        sum_sim = np.where(positive, sims, 0).sum(axis=1)
+        sum_ratings = np.where(positive, sims * ratings, 0).sum(axis=1)
+        enough = positive.sum(axis=1) >= min_k
+        
+        predictions = np.full(len(sims), self.global_mean, dtype=np.float64)
+        predictions[enough] = sum_ratings[enough] / sum_sim[enough]
+        return predictions
+
+    def _score_knn(self, item_idx, values, block_size=2048):
+        """Item-based KNN predictions of every item from one user's ratings"""
+        n_items = len(self.item_to_idx)
+        scores = np.empty(n_items, dtype=np.float64)
+        for start in range(0, n_items, block_size):
+            scores[start:start + block_size] = self._knn_predict(self._sim_block(start, start + block_size, item_idx), values)
+        return scores
+
+    def _rescore_exact(self, scores, item_idx, values, n_recommendations):
+        """Clipped scores with the best approximate candidates re-scored from the full-precision rows"""
+        scores = np.clip(scores, *self.rating_scale)
+        if self.exact_sim is None:
+            return scores
+        
+        available = len(scores) - len(np.unique(item_idx))
+        pool = rescore_pool_size(candidate_pool_size(n_recommendations, available), available)
+        if pool <= 0:
+            return scores
+        ranked = scores.copy()
+        ranked[item_idx] = -np.inf
+        candidates = np.argpartition(-ranked, pool - 1)[:pool]
+        
+        exact = np.clip(self._knn_predict(np.asarray(self.exact_sim[np.ix_(candidates, item_idx)]), values), *self.rating_scale)
+        # Everything outside the pool ranks below it
+        np.minimum(scores, np.nextafter(exact.min(), -np.inf), out=scores)
+        scores[candidates] = exact
+        return scores
+
+    def predict_scores(self, user_ids, block_size=512, clip=True):
+        """Predicted ratings of every item for a batch of known users (rows follow user_ids)"""
+        try:
+            user_idx = np.array([self.user_to_idx[str(user_id)] for user_id in user_ids], dtype=np.int64)
+            scores = np.empty((len(user_idx), len(self.item_to_idx)), dtype=np.float64)
+            
+            if self.algorithm.lower() == 'svd':
+                # One matrix product per block of users
+                for start in range(0, len(user_idx), block_size):
+                    users = user_idx[start:start + block_size]
+                    scores[start:start + block_size] = (
+                        self.global_mean
+                        + self.user_bias[users, None]
+                        + self.item_bias[None, :]
+                        + self.user_factors[users] @ self.item_factors.T
+                    )
+            else:
+                for row, idx in enumerate(user_idx):
+                    item_idx, values = self._user_ratings(idx)
+                    scores[row] = self._score_knn(item_idx, values)
+            
+            if clip:
+                np.clip(scores, *self.rating_scale, out=scores)
+            return scores
+            
+        except Exception as e:
+            print(f"Error in predict_scores: {str(e)}")
+            raise
+
+    def _user_ratings(self, user_idx):
+        """Item indices and ratings of a training user, in Surprise's stored order"""
+        user_ratings = self.trainset.ur[self.user_inner[user_idx]]
+        item_idx = self.inner_to_item[[inner for inner, _ in user_ratings]]
+        values = np.array([rating for _, rating in user_ratings])
+        return item_idx, values
+
+    def _diversity_weight(self, diversity):
+        """Per-request diversity weight, falling back to the compiled model's setting"""
+        method = self.params.get('rerank', 'mmr')
+        if method not in RERANK_METHODS:
+            raise ValueError(f"Unknown re-ranking method '{method}'. Use one of {list(RERANK_METHODS)}")
+        weight = float(self.params.get('diversity', 0.0) if diversity is None else diversity)
+        if not 0 <= weight <= 1:
+            raise ValueError("Diversity weight must be between 0 and 1")
+        return weight
+
+    def _rerank(self, candidates, relevance, n_recommendations, weight, similarity):
+        """Keep the best N of the sorted candidates, re-ranked for diversity when weight > 0"""
+        if not weight:
+            return candidates[:n_recommendations]
+        order = rerank(relevance, similarity(candidates), n_recommendations, self.params.get('rerank', 'mmr'), weight)
+        return candidates[order]
+
+    def _item_similarity(self, item_idx):
+        """Pairwise similarity of collaborative items, from the model's own notion of similarity"""
+        if self.algorithm.lower() == 'svd':
+            return cosine_gram(self.item_factors[item_idx])
+        
+        if self.item_sim is None:
+            inner = self.item_inner[item_idx]
+            sims = self.model.sim[np.ix_(inner, inner)]
+        elif isinstance(self.item_sim, QuantizedMatrix):
+            sims = self.item_sim.select(item_idx, item_idx)
+        else:
+            sims = self.item_sim[np.ix_(item_idx, item_idx)]
+        sims = np.array(sims, dtype=np.float64)
+        np.fill_diagonal(sims, 1.0)
+        return sims
+
+    def _top_indices(self, scores, exclude, n_recommendations, weight):
+        """Item indices of the top N clipped scores, skipping excluded item indices"""
+        scores = np.clip(scores, *self.rating_scale)
+        scores[exclude] = -np.inf
+        
+        n = min(n_recommendations, len(scores) - len(exclude))
+        if n <= 0:
+            return np.empty(0, dtype=np.int64)
+        
+        # Diversity re-ranking works over a bounded pool of the best candidates
+        pool = candidate_pool_size(n, len(scores) - len(exclude)) if weight else n
+        top = np.argpartition(-scores, pool - 1)[:pool]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return self._rerank(top, scores[top], n, weight, self._item_similarity)
+
+    def _top_n(self, scores, exclude, n_recommendations, diversity=None):
+        """Select the top N items by score, skipping excluded item indices"""
+        top = self._top_indices(scores, exclude, n_recommendations, self._diversity_weight(diversity))
+        scores = np.clip(scores, *self.rating_scale)
+        
+        return [
+            {
+                'output_value': str(self.item_names[idx]),  # Use item name instead of ID
+                'score': float(scores[idx])
+            }
+            for idx in top
+        ]
+
+    def _generate_collaborative_recommendations(self, inputs, n_recommendations=5, ratings=None, diversity=None):
+        """Generate collaborative filtering recommendations"""
+        try:
+            print(f"\nGenerating collaborative recommendations for: {inputs}")
+            
+            # Get the user ID from inputs using the correct column name
+            inputs = inputs or {}
+            user_id = inputs.get(self.user_col)
+            user_id = str(user_id).strip() if user_id is not None else ''
+            
+            if user_id in self.user_to_idx:
+                user_idx = self.user_to_idx[user_id]
+                item_idx, values = self._user_ratings(user_idx)
+                
+                if self.algorithm.lower() == 'svd':
+                    scores = self._score_svd(self.user_factors[user_idx], self.user_bias[user_idx])
+                else:
+                    scores = self._rescore_exact(self._score_knn(item_idx, values), item_idx, values, n_recommendations)
+            
+            elif ratings:
+                # Cold-start user: fold in from the supplied ratings vector
+                print(f"Folding in unknown user from {len(ratings)} ratings")
+                item_idx, values = self._parse_ratings(ratings)
+                
+                if self.algorithm.lower() == 'svd':
+                    scores = self._score_svd(*self._fold_in_user(item_idx, values))
+                else:
+                    scores = self._rescore_exact(self._score_knn(item_idx, values), item_idx, values, n_recommendations)
+            
+            elif not user_id:
+                raise ValueError(f"Please provide a valid {self.user_col} or a list of item ratings")
+            else:
+                raise ValueError(f"User ID '{user_id}' not found in training data")
+            
+            recommendations = self._top_n(scores, item_idx, n_recommendations, diversity)
             
             print(f"Generated {len(recommendations)} recommendations")
             return recommendations
@@ -372,7 +797,38 @@ class RecommenderSystem:
             print(f"Error in _generate_collaborative_recommendations: {str(e)}")
             raise
 
-    def _generate_content_recommendations(self, inputs, n_recommendations):
-        """Existing content-based recommendation method"""
-        # Your existing content-based recommendation code here
-        pass
\ No newline at end of file
+    def _generate_content_recommendations(self, inputs, n_recommendations, diversity=None, min_score=0.1):
+        """Most similar catalog rows to the input text, one per distinct output value"""
+        try:
+            values = inputs.values() if isinstance(inputs, dict) else [inputs]
+            query = self.tfidf.transform([' '.join(str(v).lower() for v in values)])
+            
+            # Rows and query are L2-normalized, so the dot product is the cosine similarity
+            scores = (self.tfidf_matrix @ query.T).toarray().ravel()
+            
+            candidates = np.flatnonzero(scores >= min_score)
+            candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+            # Best row of each output value, still in score order
+            _, first = np.unique(self.output_codes[candidates], return_index=True)
+            candidates = candidates[np.sort(first)]
+            
+            weight = self._diversity_weight(diversity)
+            pool = candidate_pool_size(n_recommendations, len(candidates)) if weight else n_recommendations
+            candidates = candidates[:pool]
+            picked = self._rerank(
+                candidates, scores[candidates], n_recommendations, weight,
+                lambda rows: cosine_gram(self.tfidf_matrix[rows])
+            )
+            
+            outputs = self.data[self.output_column].iloc[picked]
+            recommendations = [
+                {'output_value': str(output_value), 'score': float(scores[idx])}
+                for output_value, idx in zip(outputs, picked)
+            ]
+            
+            print(f"Generated {len(recommendations)} recommendations")
+            return recommendations
+            
+        except Exception as e:
+            print(f"Error in _generate_content_recommendations: {str(e)}")
+            raise
\ No newline at end of file
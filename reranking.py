@@ -0,0 +1,104 @@
+import numpy as np
+from scipy.sparse import issparse
+from sklearn.preprocessing import normalize
+
+RERANK_METHODS = ('mmr', 'dpp')
+
+# Candidates considered per requested recommendation, and a hard cap per query
+CANDIDATES_PER_RESULT = 10
+MAX_CANDIDATES = 500
+
+
+def candidate_pool_size(n_recommendations, n_available):
+    """Top-M pool the re-ranker works over; bounds the per-query cost"""
+    return min(n_available, max(n_recommendations, min(CANDIDATES_PER_RESULT * n_recommendations, MAX_CANDIDATES)))
+
+
+def cosine_gram(features, block_size=256):
+    """Pairwise cosine similarity of candidate feature rows (dense or sparse), a block of rows at a time"""
+    features = normalize(features, norm='l2', copy=True)
+    n = features.shape[0]
+    gram = np.empty((n, n), dtype=np.float64)
+    for start in range(0, n, block_size):
+        block = features[start:start + block_size] @ features.T
+        gram[start:start + block_size] = block.toarray() if issparse(block) else block
+    return gram
+
+
+def _scaled_relevance(relevance):
+    """Min-max scale scores into [0, 1] so ratings and cosine scores trade off alike"""
+    low, high = relevance.min(), relevance.max()
+    if high - low <= 0:
+        return np.ones(len(relevance))
+    return (relevance - low) / (high - low)
+
+
+def mmr_order(relevance, similarity, n, diversity):
+    """Maximal marginal relevance: (1 - w) * relevance - w * max similarity to what is already picked"""
+    relevance = _scaled_relevance(relevance)
+    available = np.ones(len(relevance), dtype=bool)
+    max_similarity = np.zeros(len(relevance))
+    picked = []
+
+    for step in range(min(n, len(relevance))):
+        gain = (1 - diversity) * relevance - diversity * max_similarity
+        gain[~available] = -np.inf
+        best = int(np.argmax(gain))
+        picked.append(best)
+        available[best] = False
+        # Running max keeps every step O(M) instead of rescanning the picked set
+        column = similarity[:, best]
+        max_similarity = column.copy() if step == 0 else np.maximum(max_similarity, column)
+
+    return np.array(picked, dtype=np.int64)
+
+
+def dpp_order(relevance, similarity, n, diversity, eps=1e-10):
+    """Greedy MAP of a DPP with kernel q_i * S_ij * q_j, via incremental Cholesky updates"""
+    relevance = _scaled_relevance(relevance)
+    m = len(relevance)
+    n = min(n, m)
+
+    # Quality grows with relevance; diversity=1 ignores relevance entirely. The exponent is
+    # kept <= 0 (the best candidate has quality 1) so small weights cannot overflow
+    theta = 1 - diversity
+    quality = np.exp(theta * (relevance - 1) / (2 * diversity))
+
+    cholesky = np.zeros((n, m))
+    gains = quality ** 2 * np.diag(similarity)
+    available = np.ones(m, dtype=bool)
+    picked = []
+
+    for step in range(n):
+        masked = np.where(available, gains, -np.inf)
+        best = int(np.argmax(masked))
+        if masked[best] <= eps:
+            break
+        picked.append(best)
+        available[best] = False
+
+        kernel_row = quality[best] * quality * similarity[best]
+        update = (kernel_row - cholesky[:step, best] @ cholesky[:step]) / np.sqrt(gains[best])
+        cholesky[step] = update
+        gains = gains - update ** 2
+
+    # Kernel exhausted (near-duplicate candidates): fill up by relevance
+    if len(picked) < n:
+        rest = np.flatnonzero(available)
+        picked += rest[np.argsort(-relevance[rest], kind='stable')][:n - len(picked)].tolist()
+
+    return np.array(picked, dtype=np.int64)
+
+
+def rerank(relevance, similarity, n, method='mmr', diversity=0.0):
+    """Positions of the n candidates to show, trading relevance for diversity by weight in [0, 1]"""
+    if method not in RERANK_METHODS:
+        raise ValueError(f"Unknown re-ranking method '{method}'. Use one of {list(RERANK_METHODS)}")
+    if not 0 <= diversity <= 1:
+        raise ValueError("Diversity weight must be between 0 and 1")
+
+    if diversity == 0 or len(relevance) <= 1:
+        return np.argsort(-relevance, kind='stable')[:n]
+    if method == 'dpp':
+        return dpp_order(relevance, similarity, n, diversity)
+    return mmr_order(relevance, similarity, n, diversity)
@@ -0,0 +1,150 @@
+import os
+import itertools
+import math
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
+
+# Scheduling priority increment for training and rendering worker processes
+WORKER_NICENESS = 10
+
+# Lower numbers run first within a pool
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 10
+
+# name: (workers, max queued jobs, max in-flight jobs per session, run jobs in worker processes)
+# Model fitting and plotting hold the GIL, so they run in processes and cannot stall lookups;
+# background jobs either start their own processes (evaluation, tuning) or are short model updates
+DEFAULT_POOLS = {
+    'serving': (8, 256, 16, False),
+    'training': (2, 8, 1, True),
+    'rendering': (1, 8, 1, True),
+    'background': (2, 8, 1, False)
+}
+
+
+class SchedulerBusyError(Exception):
+    """Raised when a pool's queue or a session's concurrency cap is full"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class WorkPool:
+    """Fixed set of worker threads draining a bounded priority queue, optionally into worker processes"""
+
+    def __init__(self, name, workers, max_queue, session_limit, processes=False):
+        self.name = name
+        self.workers = workers
+        self.session_limit = session_limit
+        self.processes = processes
+        self._executor = None
+        self._queue = queue.PriorityQueue(maxsize=max_queue)
+        self._sequence = itertools.count()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self._avg_duration = 1.0
+        self._started = False
+
+    def _start(self):
+        # Threads and processes start on first use so importing this module has no side effects
+        if self.processes:
+            self._executor = self._new_executor()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{index}", daemon=True)
+            thread.start()
+        self._started = True
+
+    def _new_executor(self):
+        # forkserver: the web server is multithreaded, so never fork it directly. Workers run
+        # niced, so on a busy machine the OS schedules the serving process ahead of them
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context('forkserver'),
+            initializer=os.nice,
+            initargs=(WORKER_NICENESS,)
+        )
+
+    def _call(self, fn, args, kwargs):
+        """Run a job on this thread, or in a worker process (fn, arguments and result must pickle)"""
+        if not self.processes:
+            return fn(*args, **kwargs)
+        try:
+            return self._executor.submit(fn, *args, **kwargs).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); replace the pool so later jobs still run
+            with self._lock:
+                self._executor = self._new_executor()
+            raise
+
+    def retry_after(self):
+        """Rough seconds until a slot frees up, from queue depth and average job time"""
+        waves = (self._queue.qsize() + self.workers) / self.workers
+        return max(1, math.ceil(waves * self._avg_duration))
+
+    def submit(self, session_id, fn, args, kwargs, priority):
+        with self._lock:
+            if not self._started:
+                self._start()
+            running = self._in_flight.get(session_id, 0)
+            if running >= self.session_limit:
+                raise SchedulerBusyError(
+                    f"Too many concurrent {self.name} requests for this session",
+                    self.retry_after()
+                )
+            self._in_flight[session_id] = running + 1
+
+        future = Future()
+        try:
+            self._queue.put_nowait((priority, next(self._sequence), session_id, fn, args, kwargs, future))
+        except queue.Full:
+            self._release(session_id)
+            raise SchedulerBusyError(f"The {self.name} queue is full", self.retry_after())
+        return future
+
+    def _release(self, session_id):
+        with self._lock:
+            remaining = self._in_flight.get(session_id, 1) - 1
+            if remaining > 0:
+                self._in_flight[session_id] = remaining
+            else:
+                self._in_flight.pop(session_id, None)
+
+    def _work(self):
+        while True:
+            _, _, session_id, fn, args, kwargs, future = self._queue.get()
+            started = time.monotonic()
+            try:
+                if future.set_running_or_notify_cancel():
+                    future.set_result(self._call(fn, args, kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                duration = time.monotonic() - started
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                self._release(session_id)
+                self._queue.task_done()
+                # Drop this job's references so its arguments and result can be freed before the next job
+                del fn, args, kwargs, future
+
+
+class RequestScheduler:
+    """Separate worker pools per kind of work so slow jobs never block cheap lookups"""
+
+    def __init__(self, pools=None):
+        self.pools = {
+            name: WorkPool(name, workers, max_queue, session_limit, processes)
+            for name, (workers, max_queue, session_limit, processes) in (pools or DEFAULT_POOLS).items()
+        }
+
+    def submit(self, pool, session_id, fn, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """Queue fn on a pool and return a Future; raises SchedulerBusyError under back-pressure"""
+        return self.pools[pool].submit(session_id, fn, args, kwargs, priority)
+
+    def run(self, pool, session_id, fn, *args, priority=PRIORITY_NORMAL, **kwargs):
+        """Queue fn on a pool and block until its result is ready"""
+        return self.submit(pool, session_id, fn, *args, priority=priority, **kwargs).result()
@@ -0,0 +1,69 @@
+import numpy as np
+
+SERVING_PRECISIONS = ('float64', 'float32', 'int8')
+
+# Candidates re-scored at full precision per query: at least this many, and twice the re-ranking pool
+RESCORE_CANDIDATES = 200
+
+
+class QuantizedMatrix:
+    """Row-wise symmetric int8 quantization of a dense float matrix"""
+
+    def __init__(self, codes, scales):
+        self.codes = np.ascontiguousarray(codes, dtype=np.int8)
+        self.scales = np.ascontiguousarray(scales, dtype=np.float32)
+        self.shape = self.codes.shape
+
+    @classmethod
+    def from_blocks(cls, n_rows, n_cols, block_fn, block_size=1024):
+        """Quantize a matrix produced block by block, never holding it all in float"""
+        codes = np.empty((n_rows, n_cols), dtype=np.int8)
+        scales = np.empty(n_rows, dtype=np.float32)
+        for start in range(0, n_rows, block_size):
+            block = np.asarray(block_fn(start, min(start + block_size, n_rows)), dtype=np.float32)
+            block_scales = np.abs(block).max(axis=1) / 127
+            block_scales[block_scales == 0] = 1
+            codes[start:start + len(block)] = np.rint(block / block_scales[:, None])
+            scales[start:start + len(block)] = block_scales
+        return cls(codes, scales)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.scales.nbytes
+
+    def take(self, start, stop, cols):
+        """Dequantized float32 values of rows start:stop restricted to cols"""
+        return self.codes[start:stop][:, cols].astype(np.float32) * self.scales[start:stop, None]
+
+    def select(self, rows, cols):
+        """Dequantized float32 values at the given rows and columns"""
+        return self.codes[np.ix_(rows, cols)].astype(np.float32) * self.scales[rows, None]
+
+
+def rescore_pool_size(pool_size, n_available):
+    """How many of the best approximate candidates to re-score exactly"""
+    return min(n_available, max(RESCORE_CANDIDATES, 2 * pool_size))
+
+
+def serving_accuracy_report(reference, served, served_top, exclude):
+    """Score error on a sample of users, and the share of served top-N items that are a true top-N pick"""
+    n = max((len(top) for top in served_top), default=0)
+    if reference.size == 0 or n == 0:
+        return {'max_abs_error': 0.0, 'mean_abs_error': 0.0, f'top_{n}_overlap': 1.0}
+
+    error = np.abs(np.asarray(served, dtype=np.float64) - reference)
+    overlap = []
+    for row, top, rated in zip(reference, served_top, exclude):
+        if not len(top):
+            continue
+        row = row.copy()
+        row[rated] = -np.inf
+        # Tie-aware: any item scoring at least the reference N-th best is an equally valid pick
+        cutoff = np.partition(row, -len(top))[-len(top)]
+        overlap.append(np.mean(row[top] >= cutoff - 1e-9))
+
+    return {
+        'max_abs_error': float(error.max()),
+        'mean_abs_error': float(error.mean()),
+        f'top_{n}_overlap': float(np.mean(overlap))
+    }
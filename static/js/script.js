@@ -1051,6 +1051,68 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// Suggest item names from the compiled model's title index while typing
+function attachAutocomplete(input) {
+    const listId = 'autocomplete-suggestions';
+    let datalist = document.getElementById(listId);
+    if (!datalist) {
+        datalist = document.createElement('datalist');
+        datalist.id = listId;
+        document.body.appendChild(datalist);
+    }
+    input.setAttribute('list', listId);
+    input.setAttribute('autocomplete', 'off');
+
+    let debounceTimer = null;
+    let controller = null;
+
+    input.addEventListener('input', function() {
+        clearTimeout(debounceTimer);
+        const query = input.value.trim();
+        const sessionId = localStorage.getItem('currentSessionId');
+
+        if (!query || !sessionId) {
+            datalist.innerHTML = '';
+            return;
+        }
+
+        debounceTimer = setTimeout(() => {
+            // Only the latest keystroke's request matters
+            if (controller) {
+                controller.abort();
+            }
+            controller = new AbortController();
+
+            const params = new URLSearchParams({ session_id: sessionId, q: query, limit: 8 });
+            fetch(`http://127.0.0.1:5000/autocomplete?${params}`, { signal: controller.signal })
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        return;
+                    }
+                    datalist.innerHTML = '';
+                    data.suggestions.forEach(suggestion => {
+                        const option = document.createElement('option');
+                        option.value = suggestion.title;
+                        datalist.appendChild(option);
+                    });
+                })
+                .catch(error => {
+                    if (error.name !== 'AbortError') {
+                        console.error('Autocomplete error:', error);
+                    }
+                });
+        }, 120);
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const directSearchInput = document.querySelector('.direct-search-input');
+    if (directSearchInput) {
+        attachAutocomplete(directSearchInput);
+    }
+});
+
 function compileModel() {
     console.log('Starting model compilation');
     
@@ -1094,6 +1156,9 @@ function compileModel() {
             const storedId = localStorage.getItem('currentSessionId');
             console.log('Verified stored session ID:', storedId);
             
+            const exportButton = document.getElementById('export-model-btn');
+            if (exportButton) exportButton.style.display = '';
+            
             alert('Model compiled successfully!');
         } else {
             console.error('Compilation failed:', data.error);
@@ -1144,10 +1209,10 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
-// Add this new function for handling export
+// Download the compiled model as a standalone bundle (arrays, id maps and runtime.py)
 function exportModelCode() {
-    const config = window.modelConfig;
-    if (!config) {
+    const sessionId = window.currentSessionId || localStorage.getItem('currentSessionId');
+    if (!sessionId) {
         alert('Please compile the model first');
         return;
     }
@@ -1157,14 +1222,20 @@ function exportModelCode() {
         headers: {
             'Content-Type': 'application/json',
         },
-        body: JSON.stringify(config)
+        body: JSON.stringify({ session_id: sessionId })
+    })
+    .then(response => {
+        const contentType = response.headers.get('Content-Type') || '';
+        if (contentType.includes('application/json')) {
+            return response.json().then(data => { throw new Error(data.error); });
+        }
+        return response.blob();
     })
-    .then(response => response.blob())
     .then(blob => {
         const url = window.URL.createObjectURL(blob);
         const a = document.createElement('a');
         a.href = url;
-        a.download = 'recommender_model.py';
+        a.download = 'recommender_model.zip';
         document.body.appendChild(a);
         a.click();
         window.URL.revokeObjectURL(url);
@@ -1172,7 +1243,7 @@ function exportModelCode() {
     })
     .catch(error => {
         console.error('Export error:', error);
-        alert('Error exporting model code');
+        alert(`Error exporting model: ${error.message}`);
     });
 }
 
@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+import pandas as pd
+from evaluation import ranking_metrics, split_interactions
+
+
+class RankingMetricsTest(unittest.TestCase):
+
+    def test_hand_computed_example(self):
+        scores = np.array([
+            [0.9, 0.1, 0.8, -np.inf],
+            [0.2, 0.7, 0.1, 0.6],
+            [0.5, 0.4, 0.3, 0.2]
+        ])
+        relevant = np.array([
+            [True, False, False, True],
+            [False, False, False, True],
+            [False, False, False, False]
+        ])
+        metrics = ranking_metrics(scores, relevant, k=2)
+
+        # User 0: top [0, 2], one hit at rank 1 out of two relevant items
+        # User 1: top [1, 3], its only relevant item at rank 2
+        # User 2 has nothing relevant and is left out of the averages
+        ideal_two = 1.0 + 1.0 / np.log2(3)
+        self.assertEqual(metrics['users'], 2)
+        self.assertAlmostEqual(metrics['precision'], 0.5)
+        self.assertAlmostEqual(metrics['recall'], (0.5 + 1.0) / 2)
+        self.assertAlmostEqual(metrics['ndcg'], (1.0 / ideal_two + 1.0 / np.log2(3)) / 2)
+
+    def test_no_relevant_items(self):
+        metrics = ranking_metrics(np.ones((2, 3)), np.zeros((2, 3), dtype=bool), k=2)
+        self.assertEqual(metrics, {'precision': 0.0, 'recall': 0.0, 'ndcg': 0.0, 'users': 0})
+
+
+class SplitInteractionsTest(unittest.TestCase):
+
+    def setUp(self):
+        # User 'a' has six interactions, 'b' three; rows are deliberately out of time order
+        self.data = pd.DataFrame({
+            'user': ['a', 'b', 'a', 'a', 'b', 'a', 'a', 'b', 'a'],
+            'timestamp': [60, 30, 10, 40, 10, 20, 50, 20, 30]
+        })
+
+    def test_random_folds_partition_rows(self):
+        folds = split_interactions(self.data, 'random', n_folds=3)
+        self.assertEqual(len(folds), 3)
+        tested = np.concatenate([test for _, test in folds])
+        self.assertEqual(sorted(tested.tolist()), list(range(len(self.data))))
+        for train, test in folds:
+            self.assertEqual(sorted(np.concatenate([train, test]).tolist()), list(range(len(self.data))))
+
+    def test_time_folds_hold_out_each_users_latest(self):
+        folds = split_interactions(self.data, 'time', n_folds=2, user_col='user')
+
+        # Each user's history is cut into three chunks in time order:
+        # a: [10, 20] [30, 40] [50, 60], b: [10] [20] [30]
+        timestamps = self.data['timestamp'].to_numpy()
+        users = self.data['user'].to_numpy()
+        expected = [
+            ({('a', 10), ('a', 20), ('b', 10)}, {('a', 30), ('a', 40), ('b', 20)}),
+            ({('a', 10), ('a', 20), ('a', 30), ('a', 40), ('b', 10), ('b', 20)}, {('a', 50), ('a', 60), ('b', 30)})
+        ]
+        for (train, test), (expected_train, expected_test) in zip(folds, expected):
+            self.assertEqual(set(zip(users[train], timestamps[train])), expected_train)
+            self.assertEqual(set(zip(users[test], timestamps[test])), expected_test)
+
+    def test_time_split_requires_user_column(self):
+        with self.assertRaises(ValueError):
+            split_interactions(self.data, 'time', n_folds=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
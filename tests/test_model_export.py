@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from recommender import RecommenderSystem
+from model_export import export_model_bundle
+from export_runtime import load_model
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MOVIES = os.path.join(HERE, '..', 'movies1.csv')
+RATINGS = os.path.join(HERE, '..', 'ratings.csv')
+
+
+class ExportRoundTripTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def export_and_load(self, recommender):
+        path = os.path.join(self.directory, 'model.zip')
+        bundle_file = export_model_bundle(recommender)
+        with bundle_file, open(path, 'wb') as f:
+            shutil.copyfileobj(bundle_file, f)
+        return load_model(path)
+
+    def assertSameRecommendations(self, expected, actual):
+        # Scores may differ in the last bits, which can reorder exact ties; compare scores, and
+        # outputs only above the lowest score where a tie could swap items in or out
+        self.assertEqual(len(expected), len(actual))
+        expected_scores = [row['score'] for row in expected]
+        np.testing.assert_allclose(expected_scores, [row['score'] for row in actual], rtol=1e-6, atol=1e-9)
+        cutoff = min(expected_scores, default=0) + 1e-6
+        self.assertEqual(
+            {row['output_value'] for row in expected if row['score'] > cutoff},
+            {row['output_value'] for row in actual if row['score'] > cutoff}
+        )
+
+    def test_collaborative_svd(self):
+        ratings = pd.read_csv(RATINGS).head(3000).merge(pd.read_csv(MOVIES), on='movieId')
+        recommender = RecommenderSystem(ratings, 'collaborative', ['userId', 'movieId', 'rating'], algorithm='svd')
+        model = self.export_and_load(recommender)
+
+        for user_idx in range(0, len(recommender.idx_to_user), 3):
+            inputs = {'userId': recommender.idx_to_user[user_idx]}
+            self.assertSameRecommendations(
+                recommender.generate_recommendations(inputs, 10),
+                model.generate_recommendations(inputs, 10)
+            )
+
+    def test_content(self):
+        recommender = RecommenderSystem(pd.read_csv(MOVIES).head(500), 'content', ['genres', 'title'])
+        model = self.export_and_load(recommender)
+
+        for genres in ('Adventure Animation Children', 'Comedy Romance', 'Crime Drama Thriller', 'Documentary'):
+            inputs = {'genres': genres}
+            self.assertSameRecommendations(
+                recommender.generate_recommendations(inputs, 10),
+                model.generate_recommendations(inputs, 10)
+            )
+
+    def test_rebuilt_bundle_is_not_served_from_a_stale_extraction(self):
+        movies = pd.read_csv(MOVIES).head(200)
+        recommender = RecommenderSystem(movies, 'content', ['genres', 'title'], params={'vectorizer': 'hashing'})
+        self.assertEqual(self.export_and_load(recommender).generate_recommendations({'genres': 'Zzzgenre'}, 3), [])
+
+        added = recommender.add_items(pd.DataFrame([{'movieId': 999999, 'genres': 'Zzzgenre', 'title': 'Brand New (2030)'}]))
+        results = self.export_and_load(added).generate_recommendations({'genres': 'Zzzgenre'}, 3)
+        self.assertEqual([row['output_value'] for row in results], ['Brand New (2030)'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+from reranking import cosine_gram, rerank
+
+
+def clustered_candidates():
+    """Six candidates in two tight clusters; relevance favours the first cluster"""
+    rng = np.random.default_rng(0)
+    centers = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]])
+    features = np.repeat(centers, 3, axis=0) + rng.normal(scale=0.01, size=(6, 3))
+    relevance = np.array([0.9, 0.85, 0.8, 0.5, 0.45, 0.4])
+    return relevance, cosine_gram(features)
+
+
+class RerankTest(unittest.TestCase):
+
+    def test_tiny_weight_keeps_relevance_order(self):
+        rng = np.random.default_rng(1)
+        relevance = rng.random(50)
+        similarity = cosine_gram(rng.random((50, 8)))
+        expected = np.argsort(-relevance, kind='stable')[:10]
+        for method in ('mmr', 'dpp'):
+            for weight in (1e-6, 1e-4, 1e-3):
+                order = rerank(relevance, similarity, 10, method, weight)
+                np.testing.assert_array_equal(order, expected, err_msg=f"{method} at {weight}")
+
+    def test_full_weight_spreads_across_clusters(self):
+        relevance, similarity = clustered_candidates()
+        for method in ('mmr', 'dpp'):
+            for weight in (0.9, 0.999, 1.0):
+                order = rerank(relevance, similarity, 2, method, weight)
+                self.assertEqual(len(set(order.tolist())), 2)
+                self.assertEqual({int(i) // 3 for i in order}, {0, 1}, msg=f"{method} at {weight}")
+
+    def test_results_are_distinct_and_complete(self):
+        relevance, similarity = clustered_candidates()
+        for method in ('mmr', 'dpp'):
+            for weight in (1e-9, 0.5, 1.0):
+                order = rerank(relevance, similarity, 6, method, weight)
+                self.assertEqual(sorted(order.tolist()), list(range(6)))
+
+    def test_zero_weight_is_plain_ranking(self):
+        relevance, similarity = clustered_candidates()
+        np.testing.assert_array_equal(rerank(relevance, similarity, 3, 'dpp', 0.0), [0, 1, 2])
+
+    def test_invalid_settings(self):
+        relevance, similarity = clustered_candidates()
+        with self.assertRaises(ValueError):
+            rerank(relevance, similarity, 3, 'bogus', 0.5)
+        with self.assertRaises(ValueError):
+            rerank(relevance, similarity, 3, 'mmr', 1.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import math
+import threading
+import unittest
+from scheduler import PRIORITY_NORMAL, SchedulerBusyError, WorkPool
+
+
+class BlockingJob:
+    """Job that signals when it starts and holds its worker until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.started.set()
+        self.release.wait(10)
+        return 'done'
+
+
+class WorkPoolTest(unittest.TestCase):
+
+    def test_session_cap_raises_busy(self):
+        pool = WorkPool('test', workers=1, max_queue=4, session_limit=1)
+        job = BlockingJob()
+        first = pool.submit('session', job, (), {}, PRIORITY_NORMAL)
+        self.assertTrue(job.started.wait(5))
+
+        with self.assertRaises(SchedulerBusyError) as caught:
+            pool.submit('session', job, (), {}, PRIORITY_NORMAL)
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+
+        # Other sessions are not affected by this session's cap
+        other = pool.submit('other', len, ((),), {}, PRIORITY_NORMAL)
+
+        job.release.set()
+        self.assertEqual(first.result(5), 'done')
+        self.assertEqual(other.result(5), 0)
+        # The slot is freed once the job finishes
+        self.assertEqual(pool.submit('session', len, ((1,),), {}, PRIORITY_NORMAL).result(5), 1)
+
+    def test_full_queue_raises_busy(self):
+        pool = WorkPool('test', workers=1, max_queue=1, session_limit=4)
+        job = BlockingJob()
+        running = pool.submit('a', job, (), {}, PRIORITY_NORMAL)
+        self.assertTrue(job.started.wait(5))
+        queued = pool.submit('b', len, ((),), {}, PRIORITY_NORMAL)
+
+        with self.assertRaises(SchedulerBusyError) as caught:
+            pool.submit('c', len, ((),), {}, PRIORITY_NORMAL)
+        self.assertGreaterEqual(caught.exception.retry_after, 1)
+        # A rejected job does not hold on to its session's slot
+        self.assertNotIn('c', pool._in_flight)
+
+        job.release.set()
+        self.assertEqual(running.result(5), 'done')
+        self.assertEqual(queued.result(5), 0)
+
+    def test_process_pool_returns_results(self):
+        pool = WorkPool('test', workers=1, max_queue=2, session_limit=2, processes=True)
+        self.assertEqual(pool.submit('session', math.factorial, (10,), {}, PRIORITY_NORMAL).result(60), 3628800)
+        pool._executor.shutdown()
+
+
+if __name__ == '__main__':
+    unittest.main()
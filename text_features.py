@@ -0,0 +1,51 @@
+import numpy as np
+from scipy.sparse import vstack, diags
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.preprocessing import normalize
+
+
+def combine_text_columns(data, columns):
+    """Join several columns into one text per row without a Python row loop"""
+    text = data[columns[0]].astype(str)
+    if len(columns) > 1:
+        text = text.str.cat([data[col].astype(str) for col in columns[1:]], sep=' ')
+    return text
+
+
+class StreamingTfidf:
+    """TF-IDF over a stateless HashingVectorizer, with document frequencies accumulated chunk by chunk"""
+
+    def __init__(self, n_features=2 ** 20, chunk_size=50000, **vectorizer_options):
+        self.chunk_size = chunk_size
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            alternate_sign=False,
+            norm=None,
+            **vectorizer_options
+        )
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+
+    def partial_fit(self, texts):
+        """Hash texts into term counts in bounded chunks, updating document frequencies"""
+        chunks = []
+        for start in range(0, len(texts), self.chunk_size):
+            counts = self.vectorizer.transform(texts[start:start + self.chunk_size])
+            counts.sum_duplicates()
+            self.doc_freq += np.bincount(counts.indices, minlength=len(self.doc_freq))
+            self.n_docs += counts.shape[0]
+            chunks.append(counts)
+        return vstack(chunks, format='csr') if chunks else self.vectorizer.transform([])
+
+    @property
+    def idf(self):
+        """Smoothed inverse document frequency, same formula as TfidfTransformer"""
+        return np.log((1 + self.n_docs) / (1 + self.doc_freq)) + 1
+
+    def weight(self, counts):
+        """Apply the current IDF to term counts and L2-normalize rows"""
+        return normalize(counts @ diags(self.idf), norm='l2', copy=False)
+
+    def transform(self, texts):
+        """TF-IDF vectors for texts without updating document frequencies"""
+        return self.weight(self.vectorizer.transform(texts))
@@ -0,0 +1,225 @@
+import re
+import unicodedata
+from bisect import bisect_left
+import numpy as np
+
+_NON_ALNUM = re.compile(r'[^0-9a-z]+')
+_TRAILING_YEAR = re.compile(r' (1[89]|20)[0-9]{2}$')
+
+
+def normalize_title(title):
+    """Lowercase, strip accents and punctuation, collapse whitespace"""
+    text = unicodedata.normalize('NFKD', str(title))
+    text = text.encode('ascii', 'ignore').decode().lower()
+    return _NON_ALNUM.sub(' ', text).strip()
+
+
+def trigrams(text):
+    """Set of character trigrams of a normalized string, padded at word edges"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def bounded_edit_distance(a, b, max_distance):
+    """Levenshtein distance, or max_distance + 1 as soon as it is certain to exceed it"""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous = current
+
+    return min(previous[-1], max_distance + 1)
+
+
+class TitleIndex:
+    """Prefix and trigram lookup over a fixed list of titles (positions are the ids)"""
+
+    def __init__(self, titles):
+        self.titles = np.asarray(list(titles), dtype=object)
+        self.normalized = [normalize_title(title) for title in self.titles]
+        self._lengths = np.array([len(text) for text in self.normalized], dtype=np.int64)
+        self._names = [_TRAILING_YEAR.sub('', text) for text in self.normalized]
+
+        self._exact = {}
+        for position, text in enumerate(self.normalized):
+            self._exact.setdefault(text, position)
+
+        # Unambiguous keys: exact titles, plus titles without their year when only one title has that name
+        self.resolution_keys = dict(self._exact)
+        by_name = {}
+        for text, name in zip(self.normalized, self._names):
+            if name != text:
+                by_name.setdefault(name, set()).add(text)
+        for name, texts in by_name.items():
+            if len(texts) == 1 and name not in self.resolution_keys:
+                self.resolution_keys[name] = self._exact[texts.pop()]
+
+        # Word-prefix index: every suffix of a title starting at a word boundary, sorted
+        keys = []
+        for position, text in enumerate(self.normalized):
+            start = 0
+            for word in text.split(' '):
+                keys.append((text[start:], position, start))
+                start += len(word) + 1
+        keys.sort()
+        self._prefix_keys = [key for key, _, _ in keys]
+        self._prefix_positions = np.array([position for _, position, _ in keys], dtype=np.int64)
+        self._prefix_starts = np.array([start for _, _, start in keys], dtype=np.int64)
+
+        # Precomputed prefix ranking: whole-title matches, then shorter titles, then catalog order
+        self._prefix_rank = np.lexsort((
+            self._prefix_positions,
+            self._lengths[self._prefix_positions],
+            self._prefix_starts > 0
+        )).argsort()
+
+        # Trigram inverted index
+        postings = {}
+        self._trigram_counts = np.zeros(len(self.titles), dtype=np.int32)
+        for position, text in enumerate(self.normalized):
+            grams = trigrams(text)
+            self._trigram_counts[position] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(position)
+        self._postings = {gram: np.array(positions, dtype=np.int64) for gram, positions in postings.items()}
+
+    def __len__(self):
+        return len(self.titles)
+
+    def prefix_search(self, query, limit=10):
+        """Positions of titles with a word starting with the query, best ranked first"""
+        query = normalize_title(query)
+        if not query or limit <= 0:
+            return []
+
+        start = bisect_left(self._prefix_keys, query)
+        end = bisect_left(self._prefix_keys, query + '\x7f', lo=start)
+        if start == end:
+            return []
+
+        # Only the best few ranks need sorting, however many keys share the prefix
+        ranks = self._prefix_rank[start:end]
+        take = min(len(ranks), limit * 4)
+        if take < len(ranks):
+            best = np.argpartition(ranks, take - 1)[:take]
+        else:
+            best = np.arange(len(ranks))
+        best = best[np.argsort(ranks[best])]
+
+        positions = self._prefix_positions[start:end][best]
+        _, first = np.unique(positions, return_index=True)
+        matches = positions[np.sort(first)][:limit].tolist()
+
+        if len(matches) < limit and take < len(ranks):
+            # Titles repeated across many word starts crowded the window, rank them all
+            positions = self._prefix_positions[start:end][np.argsort(ranks)]
+            _, first = np.unique(positions, return_index=True)
+            matches = positions[np.sort(first)][:limit].tolist()
+
+        return matches
+
+    def trigram_search(self, query, limit=10, min_similarity=0.3):
+        """(position, similarity) pairs ranked by trigram overlap, tolerant of typos"""
+        query = normalize_title(query)
+        query_grams = trigrams(query)
+        known = [gram for gram in query_grams if gram in self._postings]
+        if not query or not known or limit <= 0:
+            return []
+
+        shared = np.bincount(
+            np.concatenate([self._postings[gram] for gram in known]),
+            minlength=len(self.titles)
+        )
+        candidates = np.flatnonzero(shared)
+        shared = shared[candidates]
+
+        # Containment rewards covering the query, Jaccard prefers titles of similar length
+        containment = shared / len(query_grams)
+        jaccard = shared / (len(query_grams) + self._trigram_counts[candidates] - shared)
+        similarity = 0.75 * containment + 0.25 * jaccard
+
+        keep = containment >= min_similarity
+        candidates, similarity = candidates[keep], similarity[keep]
+        if not len(candidates):
+            return []
+
+        pool = min(len(candidates), limit * 2)
+        best = np.argpartition(-similarity, pool - 1)[:pool]
+        best = best[np.argsort(-similarity[best], kind='stable')]
+
+        # Re-rank the pool by how few edits turn the query into the start of a title word
+        max_typos = 1 if len(query) <= 4 else 2
+        ranked = []
+        for i in best:
+            text = self.normalized[candidates[i]]
+            starts = [0] + [j + 1 for j, char in enumerate(text) if char == ' ']
+            distance = min(
+                bounded_edit_distance(query, text[start:start + len(query)], max_typos)
+                for start in starts
+            )
+            ranked.append((distance, -similarity[i], int(candidates[i])))
+        ranked.sort()
+
+        return [(position, float(-score)) for _, score, position in ranked[:limit]]
+
+    def _prefix_score(self, query, position):
+        """Share of the title (without its year) a prefix match covers; partial words count half"""
+        name = self._names[position]
+        if query == name or query.startswith(name + ' '):
+            return 1.0
+        padded = f' {name} '
+        at = padded.find(f' {query}')
+        if at < 0:
+            # Only the year matched
+            return 0.0
+        coverage = min(1.0, len(query) / max(len(name), 1))
+        return coverage if padded[at + len(query) + 1] == ' ' else coverage / 2
+
+    def search(self, query, limit=10):
+        """(position, score) pairs: prefix matches first, scored by how much of the title they cover, then fuzzy matches"""
+        normalized = normalize_title(query)
+        results = [
+            (position, self._prefix_score(normalized, position))
+            for position in self.prefix_search(query, limit)
+        ]
+        if len(results) < limit:
+            seen = {position for position, _ in results}
+            for position, score in self.trigram_search(query, limit + len(results)):
+                if position not in seen:
+                    results.append((position, score))
+                if len(results) >= limit:
+                    break
+        return results
+
+    def autocomplete(self, query, limit=10):
+        """Suggestions for a partially typed title"""
+        return [
+            {'title': str(self.titles[position]), 'position': position, 'score': score}
+            for position, score in self.search(query, limit)
+        ]
+
+    def lookup(self, query, min_similarity=0.0):
+        """Best matching position for a query, or None"""
+        exact = self._exact.get(normalize_title(query))
+        if exact is not None:
+            return exact
+        matches = self.search(query, limit=5)
+        if matches:
+            position, score = max(matches, key=lambda match: match[1])
+            if score >= min_similarity:
+                return position
+        return None
+
+    def resolve(self, query):
+        """Position of an exact or single unambiguous whole-title match, or None; never guesses"""
+        return self.resolution_keys.get(normalize_title(query))
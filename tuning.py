@@ -0,0 +1,220 @@
+import os
+import itertools
+import numpy as np
+import pandas as pd
+from multiprocessing import get_context, shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from surprise import Dataset, Reader
+from recommender import build_collaborative_model, SVD_DEFAULT_PARAMS
+
+SEARCH_METHODS = ('grid', 'halving')
+
+DEFAULT_PARAM_GRIDS = {
+    'svd': {
+        'n_factors': [50, 100, 150],
+        'lr_all': [0.002, 0.005, 0.01],
+        'reg_all': [0.02, 0.05, 0.1]
+    },
+    'knn': {
+        'k': [20, 40, 60],
+        'similarity': ['cosine', 'msd', 'pearson']
+    }
+}
+
+# Per-process state, filled once by _init_worker
+_worker_state = {}
+
+
+def _model_kind(algorithm):
+    return 'svd' if algorithm.lower() == 'svd' else 'knn'
+
+
+def _share_arrays(arrays):
+    """Copy arrays into shared memory blocks; returns the blocks and a picklable spec"""
+    blocks, spec = [], {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        spec[name] = (block.name, array.dtype.str, array.shape)
+    return blocks, spec
+
+
+def _init_worker(spec, rating_scale):
+    """Attach to the shared interaction arrays and build the training set once per worker"""
+    arrays = {}
+    blocks = []
+    for name, (block_name, dtype, shape) in spec.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        arrays[name] = array
+        blocks.append(block)
+
+    is_validation = arrays['is_validation']
+    train = pd.DataFrame({
+        'user': arrays['user'][~is_validation],
+        'item': arrays['item'][~is_validation],
+        'rating': arrays['rating'][~is_validation]
+    })
+    trainset = Dataset.load_from_df(train, Reader(rating_scale=rating_scale)).build_full_trainset()
+
+    # Inner ids of validation pairs, -1 where the user or item never appears in training
+    user_inner = np.full(int(arrays['user'].max()) + 1, -1)
+    for inner in trainset.all_users():
+        user_inner[trainset.to_raw_uid(inner)] = inner
+    item_inner = np.full(int(arrays['item'].max()) + 1, -1)
+    for inner in trainset.all_items():
+        item_inner[trainset.to_raw_iid(inner)] = inner
+
+    _worker_state.update({
+        'blocks': blocks,
+        'trainset': trainset,
+        'val_user': arrays['user'][is_validation],
+        'val_item': arrays['item'][is_validation],
+        'val_rating': arrays['rating'][is_validation],
+        'val_user_inner': user_inner[arrays['user'][is_validation]],
+        'val_item_inner': item_inner[arrays['item'][is_validation]]
+    })
+
+
+def _validation_rmse(model, kind):
+    """RMSE of a fitted model on the worker's validation interactions"""
+    state = _worker_state
+    trainset = state['trainset']
+
+    if kind == 'svd':
+        # Same estimate as SVD.estimate, for all validation pairs at once
+        users, items = state['val_user_inner'], state['val_item_inner']
+        known_user, known_item = users >= 0, items >= 0
+        both = known_user & known_item
+        estimates = np.full(len(users), trainset.global_mean)
+        estimates[known_user] += model.bu[users[known_user]]
+        estimates[known_item] += model.bi[items[known_item]]
+        estimates[both] += (model.pu[users[both]] * model.qi[items[both]]).sum(axis=1)
+        estimates = np.clip(estimates, *trainset.rating_scale)
+    else:
+        estimates = np.array([
+            model.predict(user, item).est
+            for user, item in zip(state['val_user'].tolist(), state['val_item'].tolist())
+        ])
+
+    return float(np.sqrt(np.mean((estimates - state['val_rating']) ** 2)))
+
+
+def _run_trial(task):
+    """Fit one configuration at increasing epoch budgets, stopping once validation loss stops improving"""
+    kind, config, budgets = task
+    trial = {'config': config, 'params': None, 'rmse': float('inf'), 'history': []}
+
+    for epochs in budgets:
+        params = dict(config, n_epochs=epochs) if epochs else dict(config)
+        model = build_collaborative_model(kind, params)
+        model.fit(_worker_state['trainset'])
+        loss = _validation_rmse(model, kind)
+        trial['history'].append({'n_epochs': epochs, 'rmse': loss})
+
+        if loss >= trial['rmse']:
+            break
+        trial['params'], trial['rmse'] = params, loss
+
+    return trial
+
+
+def _successive_halving(executor, kind, configs, budgets, eta):
+    """Train all configs on the smallest budget and promote the best 1/eta to the next one"""
+    active = [{'config': config, 'params': None, 'rmse': float('inf'), 'history': []} for config in configs]
+    finished = []
+
+    for rung, epochs in enumerate(budgets):
+        outcomes = list(executor.map(_run_trial, [(kind, trial['config'], [epochs]) for trial in active]))
+
+        survivors = []
+        for trial, outcome in zip(active, outcomes):
+            trial['history'] += outcome['history']
+            if outcome['rmse'] < trial['rmse']:
+                trial['params'], trial['rmse'] = outcome['params'], outcome['rmse']
+                survivors.append(trial)
+            else:
+                # Validation loss got worse with more epochs, stop this config early
+                finished.append(trial)
+
+        survivors.sort(key=lambda trial: trial['rmse'])
+        keep = len(survivors) if rung == len(budgets) - 1 else max(1, len(survivors) // eta)
+        finished += survivors[keep:]
+        active = survivors[:keep]
+        if not active:
+            break
+
+    return finished + active
+
+
+def tune_collaborative_model(data, columns, algorithm='svd', search='halving', param_grid=None,
+                             validation_size=0.2, eta=3, seed=42, max_workers=None):
+    """Search collaborative hyperparameters in a process pool and return the best configuration"""
+    try:
+        if search not in SEARCH_METHODS:
+            raise ValueError(f"Unknown search method '{search}'. Use one of {list(SEARCH_METHODS)}")
+        if not 0 < validation_size < 1:
+            raise ValueError("validation_size must be between 0 and 1 (exclusive)")
+
+        kind = _model_kind(algorithm)
+        grid = param_grid or DEFAULT_PARAM_GRIDS[kind]
+        grid = {name: values if isinstance(values, list) else [values] for name, values in grid.items()}
+
+        # Epochs are the budget that successive halving and early stopping work over:
+        # the requested epoch counts when given, else a quarter, half and all of the default
+        if kind == 'svd':
+            if 'n_epochs' in grid:
+                budgets = sorted({int(epochs) for epochs in grid.pop('n_epochs')})
+                if budgets[0] < 1:
+                    raise ValueError("n_epochs values must be at least 1")
+            else:
+                max_epochs = SVD_DEFAULT_PARAMS['n_epochs']
+                budgets = sorted({max(1, max_epochs // 4), max(1, max_epochs // 2), max_epochs})
+        else:
+            budgets = [None]
+
+        configs = [dict(zip(grid.keys(), values)) for values in itertools.product(*grid.values())]
+        print(f"Tuning {algorithm} with {search} search over {len(configs)} configurations, budgets {budgets}")
+
+        user_col, item_col, rating_col = columns
+        ratings = pd.to_numeric(data[rating_col]).to_numpy(dtype=np.float64)
+        arrays = {
+            'user': pd.factorize(data[user_col].astype(str))[0].astype(np.int32),
+            'item': pd.factorize(data[item_col].astype(str))[0].astype(np.int32),
+            'rating': ratings,
+            'is_validation': np.random.default_rng(seed).random(len(data)) < validation_size
+        }
+        rating_scale = (float(ratings.min()), float(ratings.max()))
+
+        blocks, spec = _share_arrays(arrays)
+        try:
+            workers = max_workers or min(len(configs), os.cpu_count() or 1)
+            # forkserver: the web server is multithreaded, so never fork it directly
+            with ProcessPoolExecutor(max_workers=workers, mp_context=get_context('forkserver'),
+                                     initializer=_init_worker, initargs=(spec, rating_scale)) as executor:
+                if search == 'grid' or len(budgets) == 1:
+                    trials = list(executor.map(_run_trial, [(kind, config, budgets) for config in configs]))
+                else:
+                    trials = _successive_halving(executor, kind, configs, budgets, eta)
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+        trials = [trial for trial in trials if trial['params'] is not None]
+        trials.sort(key=lambda trial: trial['rmse'])
+        if not trials:
+            raise ValueError("No configuration could be evaluated")
+
+        print(f"Best {algorithm} configuration: {trials[0]['params']} (validation RMSE {trials[0]['rmse']:.4f})")
+        return {
+            'best_params': trials[0]['params'],
+            'best_rmse': trials[0]['rmse'],
+            'trials': trials
+        }
+
+    except Exception as e:
+        print(f"Error in tune_collaborative_model: {str(e)}")
+        raise